@@ -0,0 +1,243 @@
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable
+
+from benchmarks.fake_push import FakeEventSub, FakeHub
+from thaddeus_bot.app_config import (
+    HttpConfig,
+    HttpServerConfig,
+    TwitchConfig,
+    TwitchEventSubConfig,
+    YouTubeConfig,
+    YouTubeWebSubConfig,
+)
+from thaddeus_bot.http_server import HttpServer
+from thaddeus_bot.http_transport import HttpTransport
+from thaddeus_bot.stream_clients import LiveResult, TwitchClient, YouTubeClient
+from thaddeus_bot.twitch_eventsub import TwitchEventSub
+from thaddeus_bot.youtube_websub import YouTubeWebSub
+
+
+WAIT_SECONDS = 5.0
+READ_TIMEOUT_SECONDS = 0.5
+
+
+class Checks:
+    def __init__(self) -> None:
+        self.failures: list[str] = []
+
+    def expect(self, condition: bool, description: str) -> None:
+        print(f"{'ok  ' if condition else 'FAIL'} {description}")
+        if not condition:
+            self.failures.append(description)
+
+    async def wait_for(self, condition: Callable[[], bool], description: str) -> None:
+        deadline = time.monotonic() + WAIT_SECONDS
+        while not condition() and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        self.expect(condition(), description)
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Check the push receivers against local fake upstreams")
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    checks = Checks()
+    asyncio.run(_run(checks))
+    if checks.failures:
+        print(f"{len(checks.failures)} checks failed", file=sys.stderr)
+        sys.exit(1)
+
+
+async def _run(checks: Checks) -> None:
+    server = HttpServer(HttpServerConfig("127.0.0.1", 0, read_timeout_seconds=READ_TIMEOUT_SECONDS))
+    await server.start()
+    transport = HttpTransport(HttpConfig(max_retries=0, timeout_seconds=5))
+    try:
+        await _check_idle_connection(checks, server)
+        await _check_eventsub(checks, server, transport)
+        await _check_websub(checks, server, transport)
+    finally:
+        await transport.aclose()
+        await server.stop()
+
+
+async def _check_idle_connection(checks: Checks, server: HttpServer) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+    try:
+        closed = await asyncio.wait_for(reader.read(), READ_TIMEOUT_SECONDS * 4) == b""
+    except asyncio.TimeoutError:
+        closed = False
+    writer.close()
+    checks.expect(closed, "idle connection is closed after read_timeout_seconds")
+
+
+async def _check_eventsub(checks: Checks, server: HttpServer, transport: HttpTransport) -> None:
+    fake = FakeEventSub()
+    url = await fake.start()
+    fake.users = {"alpha": "101", "beta": "102"}
+    config = TwitchEventSubConfig(
+        callback_url=f"http://127.0.0.1:{server.port}/twitch/eventsub",
+        secret="check-secret-123",
+        sync_interval_seconds=60,
+    )
+    client = TwitchClient(
+        TwitchConfig(
+            client_id="check",
+            client_secret="check",
+            api_url=f"{url}/helix",
+            auth_url=f"{url}/oauth2",
+            eventsub=config,
+            token_file=None,
+        ),
+        transport,
+    )
+    results: list[tuple[str, LiveResult]] = []
+    reconciled: list[list[str]] = []
+
+    async def on_result(channel: str, result: LiveResult) -> None:
+        results.append((channel, result))
+
+    async def on_reconcile(channels: list[str]) -> None:
+        reconciled.append(sorted(channels))
+
+    eventsub = TwitchEventSub(config, client, server, on_result, on_reconcile)
+    task = asyncio.create_task(eventsub.run(lambda: ["alpha", "Beta"]))
+    try:
+        await checks.wait_for(lambda: len(fake.enabled()) == 4, "subscriptions are created and pass the challenge")
+        checks.expect(reconciled == [["Beta", "alpha"]], "first sync reconciles every channel")
+
+        fake.live["alpha"] = "stream-1"
+        message_id = "message-1"
+        response = await fake.notify("stream.online", "alpha", message_id=message_id)
+        checks.expect(response.status_code == 204, "signed notification is accepted")
+        await checks.wait_for(lambda: len(results) == 1, "notification is delivered")
+        channel, result = results[0] if results else ("", LiveResult(False, ""))
+        checks.expect(
+            channel == "alpha" and result.is_live and result.stream_id == "stream-1",
+            "online event resolves the live stream",
+        )
+
+        response = await fake.notify("stream.offline", "alpha", message_id=message_id)
+        await asyncio.sleep(0.1)
+        checks.expect(response.status_code == 204 and len(results) == 1, "replayed message id is ignored")
+
+        response = await fake.notify("stream.offline", "alpha", secret="wrong-secret-123")
+        checks.expect(response.status_code == 403, "bad signature is rejected")
+
+        old = (datetime.now(timezone.utc) - timedelta(minutes=20)).isoformat().replace("+00:00", "Z")
+        response = await fake.notify("stream.offline", "alpha", timestamp=old)
+        checks.expect(response.status_code == 403, "message older than ten minutes is rejected")
+
+        response = await fake.notify("stream.offline", "alpha")
+        await checks.wait_for(
+            lambda: len(results) == 2 and not results[1][1].is_live, "offline event is delivered"
+        )
+
+        response = await fake.revoke("stream.online", "beta")
+        checks.expect(response.status_code == 204, "revocation is acknowledged")
+        await checks.wait_for(lambda: len(fake.enabled()) == 4, "revoked subscription is recreated")
+        checks.expect(reconciled[-1] == ["beta"], "recreated channel is reconciled")
+
+        fake.fail_requests = True
+        failed_before = fake.requests["GET /helix/users"]
+        eventsub.resync()
+        await checks.wait_for(lambda: fake.requests["GET /helix/users"] > failed_before, "sync fails during outage")
+        await asyncio.sleep(0.2)
+        fake.fail_requests = False
+        eventsub.resync()
+        await checks.wait_for(
+            lambda: reconciled[-1] == ["Beta", "alpha"], "every channel is reconciled after the outage"
+        )
+    finally:
+        task.cancel()
+        await fake.stop()
+
+
+async def _check_websub(checks: Checks, server: HttpServer, transport: HttpTransport) -> None:
+    hub = FakeHub()
+    url = await hub.start()
+    hub.granted_lease_seconds = 2
+    callback = f"http://127.0.0.1:{server.port}/youtube/websub"
+    config = YouTubeWebSubConfig(
+        callback_url=callback,
+        secret="check-secret",
+        hub_url=f"{url}/subscribe",
+        lease_seconds=5,
+        safety_poll_interval_seconds=3600,
+    )
+    results: list[tuple[str, LiveResult]] = []
+
+    async def on_result(channel: str, result: LiveResult) -> None:
+        results.append((channel, result))
+
+    channels = ["UCalpha", "UCbeta"]
+    with tempfile.TemporaryDirectory() as workdir:
+        client = YouTubeClient(
+            YouTubeConfig(
+                api_key="check",
+                api_url=f"{url}/youtube/v3",
+                cache_file=Path(workdir) / "youtube_cache.json",
+                recent_videos=5,
+                websub=config,
+            ),
+            transport,
+        )
+        websub = YouTubeWebSub(config, client, transport, server, on_result)
+        task = asyncio.create_task(websub.run(lambda: list(channels)))
+        try:
+            await checks.wait_for(lambda: set(hub.leases) == set(channels), "subscriptions are verified by the hub")
+            response = await hub.verify(callback, "UCunknown", "subscribe", 60)
+            checks.expect(response.status_code == 404, "verification for an unknown channel is refused")
+            await checks.wait_for(
+                lambda: hub.requests[("subscribe", "UCalpha")] >= 2, "lease is renewed before it expires"
+            )
+
+            hub.videos["v-live"] = {"status": "live"}
+            response = await hub.publish("UCalpha", [("UCalpha", "v-live")])
+            checks.expect(response.status_code == 204, "signed feed notification is accepted")
+            await checks.wait_for(lambda: len(results) == 1, "pushed video is checked")
+            channel, result = results[0] if results else ("", LiveResult(False, ""))
+            checks.expect(
+                channel == "UCalpha" and result.is_live and result.stream_id == "v-live",
+                "pushed live video is reported live",
+            )
+
+            hub.videos["v-upcoming"] = {"status": "upcoming", "scheduled": "2030-01-01T00:00:00Z"}
+            await hub.publish("UCbeta", [("UCbeta", "v-upcoming"), ("UCother", "v-other")], algorithm="sha256")
+            await checks.wait_for(lambda: len(results) == 2, "sha256 signature is accepted")
+            checks.expect(
+                len(results) == 2 and results[1][0] == "UCbeta" and results[1][1].scheduled_start is not None,
+                "upcoming broadcast carries its scheduled start and other channels are skipped",
+            )
+
+            await hub.publish("UCalpha", [("UCalpha", "v-live")], secret="wrong-secret")
+            await hub.publish("UCalpha", [("UCalpha", "v-live")], algorithm="")
+            response = await hub.publish("UCalpha", body=b"<feed><entry>")
+            await asyncio.sleep(0.2)
+            checks.expect(
+                response.status_code == 204 and len(results) == 2,
+                "bad, missing and unparsable notifications are ignored",
+            )
+
+            channels.remove("UCbeta")
+            websub.resync()
+            await checks.wait_for(lambda: "UCbeta" not in hub.leases, "removed channel is unsubscribed")
+        finally:
+            task.cancel()
+            await hub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+
+from thaddeus_bot.app_config import HttpServerConfig
+from thaddeus_bot.http_server import HttpRequest, HttpResponse, HttpServer
+
+
+class FakeEventSub:
+    def __init__(self) -> None:
+        self._server = HttpServer(HttpServerConfig(host="127.0.0.1", port=0))
+        self._ids = itertools.count(1)
+        self._tasks: set[asyncio.Task] = set()
+        self.users: dict[str, str] = {}
+        self.live: dict[str, str] = {}
+        self.subscriptions: dict[str, dict[str, Any]] = {}
+        self.requests: Counter[str] = Counter()
+        self.fail_requests = False
+
+    async def start(self) -> str:
+        routes: list[tuple[str, str, Callable[[HttpRequest], Awaitable[HttpResponse]]]] = [
+            ("POST", "/oauth2/token", self._token),
+            ("GET", "/helix/users", self._users),
+            ("GET", "/helix/streams", self._streams),
+            ("GET", "/helix/eventsub/subscriptions", self._list_subscriptions),
+            ("POST", "/helix/eventsub/subscriptions", self._create_subscription),
+            ("DELETE", "/helix/eventsub/subscriptions", self._delete_subscription),
+        ]
+        for method, path, handler in routes:
+            self._server.add_route(method, path, self._counted(path, handler))
+        await self._server.start()
+        return f"http://127.0.0.1:{self._server.port}"
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await self._server.stop()
+
+    def enabled(self) -> list[dict[str, Any]]:
+        return [subscription for subscription in self.subscriptions.values() if subscription["status"] == "enabled"]
+
+    async def notify(self, event_type: str, login: str, **overrides: Any) -> httpx.Response:
+        subscription = self._find(event_type, self.users[login])
+        event = {"broadcaster_user_id": self.users[login], "broadcaster_user_login": login}
+        if event_type == "stream.online":
+            event["id"] = self.live.get(login, "")
+        payload = {"subscription": subscription, "event": event}
+        return await self.deliver(subscription, "notification", payload, **overrides)
+
+    async def revoke(self, event_type: str, login: str) -> httpx.Response:
+        subscription = self.subscriptions.pop(self._find(event_type, self.users[login])["id"])
+        subscription["status"] = "authorization_revoked"
+        return await self.deliver(subscription, "revocation", {"subscription": subscription})
+
+    async def deliver(
+        self,
+        subscription: dict[str, Any],
+        message_type: str,
+        payload: dict[str, Any],
+        *,
+        message_id: str | None = None,
+        timestamp: str | None = None,
+        secret: str | None = None,
+    ) -> httpx.Response:
+        body = json.dumps(payload).encode("utf-8")
+        message_id = message_id or uuid.uuid4().hex
+        timestamp = timestamp or datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        signature = hmac.new(
+            (secret or subscription["transport"]["secret"]).encode("utf-8"),
+            message_id.encode("utf-8") + timestamp.encode("utf-8") + body,
+            hashlib.sha256,
+        ).hexdigest()
+        headers = {
+            "Content-Type": "application/json",
+            "Twitch-Eventsub-Message-Id": message_id,
+            "Twitch-Eventsub-Message-Timestamp": timestamp,
+            "Twitch-Eventsub-Message-Signature": f"sha256={signature}",
+            "Twitch-Eventsub-Message-Type": message_type,
+        }
+        async with httpx.AsyncClient(timeout=10) as client:
+            return await client.post(subscription["transport"]["callback"], content=body, headers=headers)
+
+    def _find(self, event_type: str, user_id: str) -> dict[str, Any]:
+        for subscription in self.subscriptions.values():
+            if subscription["type"] == event_type and subscription["condition"]["broadcaster_user_id"] == user_id:
+                return subscription
+        raise KeyError(f"No {event_type} subscription for {user_id}")
+
+    def _counted(
+        self, path: str, handler: Callable[[HttpRequest], Awaitable[HttpResponse]]
+    ) -> Callable[[HttpRequest], Awaitable[HttpResponse]]:
+        async def wrapped(request: HttpRequest) -> HttpResponse:
+            self.requests[f"{request.method} {path}"] += 1
+            if self.fail_requests:
+                return _json({"error": "injected failure"}, status=503)
+            return await handler(request)
+
+        return wrapped
+
+    async def _token(self, request: HttpRequest) -> HttpResponse:
+        return _json({"access_token": "fake-token", "expires_in": 3600, "token_type": "bearer"})
+
+    async def _users(self, request: HttpRequest) -> HttpResponse:
+        logins = request.query.get("login", [])
+        return _json({"data": [{"id": self.users[login], "login": login} for login in logins if login in self.users]})
+
+    async def _streams(self, request: HttpRequest) -> HttpResponse:
+        logins = request.query.get("user_login", [])
+        data = [
+            {"id": self.live[login], "user_login": login, "type": "live", "title": f"{login} stream"}
+            for login in logins
+            if login in self.live
+        ]
+        return _json({"data": data, "pagination": {}})
+
+    async def _list_subscriptions(self, request: HttpRequest) -> HttpResponse:
+        return _json({"data": list(self.subscriptions.values()), "pagination": {}})
+
+    async def _create_subscription(self, request: HttpRequest) -> HttpResponse:
+        payload = json.loads(request.body)
+        subscription = {
+            "id": f"sub-{next(self._ids)}",
+            "type": payload["type"],
+            "version": payload["version"],
+            "status": "webhook_callback_verification_pending",
+            "condition": payload["condition"],
+            "transport": payload["transport"],
+        }
+        self.subscriptions[subscription["id"]] = subscription
+        task = asyncio.create_task(self._verify(subscription))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        transport = {key: value for key, value in payload["transport"].items() if key != "secret"}
+        return _json({"data": [{**subscription, "transport": transport}]}, status=202)
+
+    async def _delete_subscription(self, request: HttpRequest) -> HttpResponse:
+        self.subscriptions.pop(request.query.get("id", [""])[0], None)
+        return HttpResponse(status=204)
+
+    async def _verify(self, subscription: dict[str, Any]) -> None:
+        challenge = uuid.uuid4().hex
+        response = await self.deliver(
+            subscription, "webhook_callback_verification", {"subscription": subscription, "challenge": challenge}
+        )
+        if response.status_code == 200 and response.text == challenge:
+            subscription["status"] = "enabled"
+        else:
+            subscription["status"] = "webhook_callback_verification_failed"
+
+
+class FakeHub:
+    def __init__(self) -> None:
+        self._server = HttpServer(HttpServerConfig(host="127.0.0.1", port=0))
+        self._tasks: set[asyncio.Task] = set()
+        self.videos: dict[str, dict[str, Any]] = {}
+        self.leases: dict[str, dict[str, Any]] = {}
+        self.requests: Counter[tuple[str, str]] = Counter()
+        self.granted_lease_seconds: int | None = None
+
+    async def start(self) -> str:
+        self._server.add_route("POST", "/subscribe", self._subscribe)
+        self._server.add_route("GET", "/youtube/v3/channels", self._channels)
+        self._server.add_route("GET", "/youtube/v3/videos", self._videos)
+        await self._server.start()
+        return f"http://127.0.0.1:{self._server.port}"
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await self._server.stop()
+
+    async def verify(self, callback: str, channel_id: str, mode: str, lease_seconds: int) -> httpx.Response:
+        params = {
+            "hub.mode": mode,
+            "hub.topic": _feed_url(channel_id),
+            "hub.challenge": uuid.uuid4().hex,
+            "hub.lease_seconds": str(lease_seconds),
+        }
+        async with httpx.AsyncClient(timeout=10) as client:
+            return await client.get(callback, params=params)
+
+    async def publish(
+        self,
+        channel_id: str,
+        entries: list[tuple[str, str]] | None = None,
+        *,
+        body: bytes | None = None,
+        secret: str | None = None,
+        algorithm: str = "sha1",
+    ) -> httpx.Response:
+        lease = self.leases[channel_id]
+        body = body if body is not None else _atom_feed(entries or [])
+        headers = {"Content-Type": "application/atom+xml"}
+        if algorithm:
+            digest = hmac.new((secret or lease["secret"]).encode("utf-8"), body, algorithm).hexdigest()
+            headers["X-Hub-Signature"] = f"{algorithm}={digest}"
+        async with httpx.AsyncClient(timeout=10) as client:
+            return await client.post(lease["callback"], content=body, headers=headers)
+
+    async def _subscribe(self, request: HttpRequest) -> HttpResponse:
+        form = {key: values[0] for key, values in parse_qs(request.body.decode("utf-8")).items()}
+        channel_id = parse_qs(urlsplit(form["hub.topic"]).query)["channel_id"][0]
+        self.requests[(form["hub.mode"], channel_id)] += 1
+        task = asyncio.create_task(self._verify_intent(form, channel_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return HttpResponse(status=202)
+
+    async def _verify_intent(self, form: dict[str, str], channel_id: str) -> None:
+        lease_seconds = self.granted_lease_seconds or int(form.get("hub.lease_seconds", "432000"))
+        response = await self.verify(form["hub.callback"], channel_id, form["hub.mode"], lease_seconds)
+        if response.status_code != 200 or response.text != response.request.url.params["hub.challenge"]:
+            return
+        if form["hub.mode"] == "subscribe":
+            self.leases[channel_id] = {"callback": form["hub.callback"], "secret": form.get("hub.secret", "")}
+        else:
+            self.leases.pop(channel_id, None)
+
+    async def _channels(self, request: HttpRequest) -> HttpResponse:
+        channel_ids = request.query.get("id", [""])[0].split(",")
+        items = [
+            {"id": channel_id, "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel_id[2:]}}}
+            for channel_id in channel_ids
+        ]
+        return _json({"items": items})
+
+    async def _videos(self, request: HttpRequest) -> HttpResponse:
+        items = []
+        for video_id in request.query.get("id", [""])[0].split(","):
+            video = self.videos.get(video_id)
+            if video is None:
+                continue
+            details = {"scheduledStartTime": video["scheduled"]} if video.get("scheduled") else {}
+            items.append(
+                {
+                    "id": video_id,
+                    "snippet": {"title": f"{video_id} stream", "liveBroadcastContent": video["status"]},
+                    "liveStreamingDetails": details,
+                }
+            )
+        return _json({"items": items})
+
+
+def _feed_url(channel_id: str) -> str:
+    return f"https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
+
+
+def _atom_feed(entries: list[tuple[str, str]]) -> bytes:
+    body = "".join(
+        f"<entry><yt:videoId>{video_id}</yt:videoId><yt:channelId>{channel_id}</yt:channelId>"
+        f"<title>{video_id}</title></entry>"
+        for channel_id, video_id in entries
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">'
+        f"{body}</feed>"
+    ).encode("utf-8")
+
+
+def _json(payload: Any, status: int = 200) -> HttpResponse:
+    return HttpResponse(status=status, body=json.dumps(payload).encode("utf-8"), content_type="application/json")
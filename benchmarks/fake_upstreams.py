@@ -0,0 +1,244 @@
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, Awaitable, Callable
+from urllib.parse import parse_qs
+
+from thaddeus_bot.app_config import HttpServerConfig
+from thaddeus_bot.http_server import HttpRequest, HttpResponse, HttpServer
+
+
+BOT_TOKEN = "123456:bench"
+RESOURCE_PATH = "bench/guide.pdf"
+RESOURCE_PATHS = (RESOURCE_PATH, "bench/rules.pdf", "bench/faq.pdf")
+RECENT_VIDEOS = 5
+
+
+@dataclass
+class FakeOptions:
+    latency_ms: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+class FakeUpstreams:
+    def __init__(self, options: FakeOptions):
+        self._options = options
+        self._random = random.Random(options.seed)
+        self._ids = itertools.count(1)
+        self._servers: dict[str, HttpServer] = {}
+        self.requests: Counter[str] = Counter()
+        self.errors: Counter[str] = Counter()
+        self.twitch_channels: list[str] = []
+        self.twitch_live: dict[str, str] = {}
+        self.youtube_uploads: dict[str, list[str]] = {}
+        self.youtube_live: dict[str, str] = {}
+        self.ended_videos: set[str] = set()
+        self.deliveries: list[tuple[float, str]] = []
+
+    async def start(self) -> dict[str, str]:
+        routes: dict[str, list[tuple[str, str, Callable[[HttpRequest], Awaitable[HttpResponse]]]]] = {
+            "twitch": [
+                ("POST", "/oauth2/token", self._twitch_token),
+                ("GET", "/helix/streams", self._twitch_streams),
+            ],
+            "youtube": [
+                ("GET", "/youtube/v3/channels", self._youtube_channels),
+                ("GET", "/youtube/v3/playlistItems", self._youtube_playlist_items),
+                ("GET", "/youtube/v3/videos", self._youtube_videos),
+            ],
+            "github": [("GET", f"/raw/{path}", self._github_raw) for path in RESOURCE_PATHS],
+            "telegram": [
+                ("POST", f"/bot{BOT_TOKEN}/sendMessage", self._telegram_send),
+                ("POST", f"/bot{BOT_TOKEN}/sendDocument", self._telegram_send),
+                ("POST", f"/bot{BOT_TOKEN}/sendMediaGroup", self._telegram_send_media_group),
+            ],
+            "control": [
+                ("POST", "/reset", self._control_reset),
+                ("POST", "/churn", self._control_churn),
+                ("GET", "/stats", self._control_stats),
+            ],
+        }
+        urls: dict[str, str] = {}
+        for name, handlers in routes.items():
+            server = HttpServer(HttpServerConfig(host="127.0.0.1", port=0))
+            for method, path, handler in handlers:
+                server.add_route(method, path, handler if name == "control" else self._upstream(name, handler))
+            await server.start()
+            self._servers[name] = server
+            urls[name] = f"http://127.0.0.1:{server.port}"
+        return urls
+
+    async def stop(self) -> None:
+        for server in self._servers.values():
+            await server.stop()
+
+    def _upstream(
+        self, name: str, handler: Callable[[HttpRequest], Awaitable[HttpResponse]]
+    ) -> Callable[[HttpRequest], Awaitable[HttpResponse]]:
+        async def wrapped(request: HttpRequest) -> HttpResponse:
+            self.requests[name] += 1
+            if self._options.latency_ms:
+                await asyncio.sleep(self._options.latency_ms / 1000 * self._random.uniform(0.5, 1.5))
+            if self._random.random() < self._options.error_rate:
+                self.errors[name] += 1
+                return _json({"error": "injected failure"}, status=503)
+            return await handler(request)
+
+        return wrapped
+
+    async def _twitch_token(self, request: HttpRequest) -> HttpResponse:
+        return _json({"access_token": "bench-token", "expires_in": 3600, "token_type": "bearer"})
+
+    async def _twitch_streams(self, request: HttpRequest) -> HttpResponse:
+        logins = request.query.get("user_login", [])
+        data = [
+            {"id": self.twitch_live[login], "user_login": login, "type": "live", "title": f"{login} stream"}
+            for login in logins
+            if login in self.twitch_live
+        ]
+        return _json({"data": data, "pagination": {}})
+
+    async def _youtube_channels(self, request: HttpRequest) -> HttpResponse:
+        channel_ids = request.query.get("id", [""])[0].split(",")
+        items = [
+            {"id": channel_id, "contentDetails": {"relatedPlaylists": {"uploads": "UU" + channel_id[2:]}}}
+            for channel_id in channel_ids
+            if channel_id in self.youtube_uploads
+        ]
+        return _json({"items": items})
+
+    async def _youtube_playlist_items(self, request: HttpRequest) -> HttpResponse:
+        channel_id = "UC" + request.query.get("playlistId", [""])[0][2:]
+        uploads = self.youtube_uploads.get(channel_id)
+        if uploads is None:
+            return _json({"error": "playlistNotFound"}, status=404)
+        return _json({"items": [{"contentDetails": {"videoId": video_id}} for video_id in uploads[:RECENT_VIDEOS]]})
+
+    async def _youtube_videos(self, request: HttpRequest) -> HttpResponse:
+        live_videos = set(self.youtube_live.values())
+        items = []
+        for video_id in request.query.get("id", [""])[0].split(","):
+            details: dict[str, Any] = {}
+            if video_id in self.ended_videos:
+                details["actualEndTime"] = "2024-01-01T00:00:00Z"
+            items.append(
+                {
+                    "id": video_id,
+                    "snippet": {
+                        "title": f"{video_id} stream",
+                        "liveBroadcastContent": "live" if video_id in live_videos else "none",
+                    },
+                    "liveStreamingDetails": details,
+                }
+            )
+        return _json({"items": items})
+
+    async def _github_raw(self, request: HttpRequest) -> HttpResponse:
+        etag = '"bench-resource"'
+        if request.headers.get("if-none-match") == etag:
+            return HttpResponse(status=304, headers={"ETag": etag})
+        return HttpResponse(body=b"%PDF-1.4 bench" * 1024, content_type="application/pdf", headers={"ETag": etag})
+
+    async def _telegram_send(self, request: HttpRequest) -> HttpResponse:
+        if request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+            text = parse_qs(request.body.decode("utf-8")).get("text", [""])[0]
+            self.deliveries.append((time.time(), text))
+            result: dict[str, Any] = {"text": text}
+        else:
+            result = {"document": {"file_id": "bench-file-id", "file_unique_id": "bench"}}
+        message = {"message_id": next(self._ids), "date": int(time.time()), "chat": {"id": 1, "type": "supergroup"}}
+        return _json({"ok": True, "result": {**message, **result}})
+
+    async def _telegram_send_media_group(self, request: HttpRequest) -> HttpResponse:
+        if request.headers.get("content-type", "").startswith("application/x-www-form-urlencoded"):
+            media = json.loads(parse_qs(request.body.decode("utf-8"))["media"][0])
+        else:
+            media = json.loads(_form_field(request.body, "media"))
+        messages = [
+            {
+                "message_id": next(self._ids),
+                "date": int(time.time()),
+                "chat": {"id": 1, "type": "supergroup"},
+                "document": {"file_id": f"bench-file-id-{index}", "file_unique_id": f"bench-{index}"},
+            }
+            for index in range(len(media))
+        ]
+        return _json({"ok": True, "result": messages})
+
+    async def _control_reset(self, request: HttpRequest) -> HttpResponse:
+        payload = json.loads(request.body)
+        self.twitch_live.clear()
+        self.youtube_uploads = {channel_id: [] for channel_id in payload["youtube"]}
+        self.youtube_live.clear()
+        self.ended_videos.clear()
+        self.deliveries.clear()
+        self.requests.clear()
+        self.errors.clear()
+        self.twitch_channels = list(payload["twitch"])
+        return _json({})
+
+    async def _control_churn(self, request: HttpRequest) -> HttpResponse:
+        fraction = json.loads(request.body)["fraction"]
+        channels = [("twitch", login) for login in self.twitch_channels]
+        channels.extend(("youtube", channel_id) for channel_id in self.youtube_uploads)
+        flipped = self._random.sample(channels, round(len(channels) * fraction))
+        changes = []
+        for platform, channel in flipped:
+            changes.append({"platform": platform, "channel": channel, "live": self._flip(platform, channel)})
+        return _json({"at": time.time(), "changes": changes})
+
+    async def _control_stats(self, request: HttpRequest) -> HttpResponse:
+        since = int(request.query.get("since", ["0"])[0])
+        return _json(
+            {"requests": dict(self.requests), "errors": dict(self.errors), "deliveries": self.deliveries[since:]}
+        )
+
+    def _flip(self, platform: str, channel: str) -> bool:
+        if platform == "twitch":
+            if self.twitch_live.pop(channel, None) is not None:
+                return False
+            self.twitch_live[channel] = str(next(self._ids))
+            return True
+
+        video_id = self.youtube_live.pop(channel, None)
+        if video_id is not None:
+            self.ended_videos.add(video_id)
+            return False
+        video_id = f"v{next(self._ids)}"
+        self.youtube_uploads[channel].insert(0, video_id)
+        self.youtube_live[channel] = video_id
+        return True
+
+
+def run_in_process(options: FakeOptions) -> tuple[multiprocessing.Process, dict[str, str]]:
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(options, child), daemon=True)
+    process.start()
+    urls = parent.recv()
+    return process, urls
+
+
+def _serve(options: FakeOptions, connection: Connection) -> None:
+    async def main() -> None:
+        upstreams = FakeUpstreams(options)
+        connection.send(await upstreams.start())
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def _form_field(body: bytes, name: str) -> str:
+    marker = f'name="{name}"'.encode("utf-8")
+    start = body.index(b"\r\n\r\n", body.index(marker)) + 4
+    return body[start : body.index(b"\r\n--", start)].decode("utf-8")
+
+
+def _json(payload: Any, status: int = 200) -> HttpResponse:
+    return HttpResponse(status=status, body=json.dumps(payload).encode("utf-8"), content_type="application/json")
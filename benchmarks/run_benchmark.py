@@ -0,0 +1,352 @@
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+import httpx
+from telegram import Bot
+
+from benchmarks.fake_upstreams import BOT_TOKEN, RESOURCE_PATH, RESOURCE_PATHS, FakeOptions, run_in_process
+from thaddeus_bot.app_config import parse_config
+from thaddeus_bot.http_transport import HttpTransport
+from thaddeus_bot.resource_cache import FileIdStore, ResourceCache
+from thaddeus_bot.send_queue import SendQueue
+from thaddeus_bot.stream_monitor import StreamMonitor
+from thaddeus_bot.telegram_runtime import dynamic_command_router
+
+
+SCHEMA_VERSION = 1
+DRAIN_TIMEOUT_SECONDS = 120
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the bot against local fake upstream servers")
+    parser.add_argument("--subscriptions", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--cycles", type=int, default=5, help="Measured poll cycles per size")
+    parser.add_argument("--youtube-share", type=float, default=0.5, help="Fraction of YouTube subscriptions")
+    parser.add_argument("--churn", type=float, default=0.01, help="Fraction of channels flipping per cycle")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean fake upstream latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of upstream requests failing")
+    parser.add_argument("--concurrency", type=int, default=4, help="poll_concurrency per platform")
+    parser.add_argument("--pool-size", type=int, default=20, help="http.pool_size")
+    parser.add_argument("--state-backend", default="json")
+    parser.add_argument("--commands", type=int, default=200, help="Dynamic command invocations")
+    parser.add_argument("--message-runs", type=int, default=20, help="Cold 'message' CLI invocations")
+    parser.add_argument("--message-batch", type=int, default=100, help="Lines sent by one 'message --batch' run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("benchmark_results.json"))
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> None:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    process, urls = run_in_process(FakeOptions(args.latency_ms, args.error_rate, args.seed))
+    try:
+        results = asyncio.run(_run(urls, args))
+    finally:
+        process.terminate()
+
+    args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+async def _run(urls: dict[str, str], args: argparse.Namespace) -> dict[str, Any]:
+    results: dict[str, Any] = {
+        "schema_version": SCHEMA_VERSION,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "options": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        "monitor": [],
+    }
+    for size in args.subscriptions:
+        scenario = await _run_monitor(urls, size, args)
+        results["monitor"].append(scenario)
+        summary = scenario["summary"]
+        print(
+            f"subscriptions={size} cycle_p50={summary['cycle_seconds']['p50']:.3f}s "
+            f"requests/cycle={summary['requests_per_cycle']:.1f} "
+            f"latency_p95={summary['notification_latency_seconds']['p95']:.3f}s "
+            f"rss={summary['rss_bytes'] / 1e6:.1f}MB",
+            file=sys.stderr,
+        )
+    results["commands"] = await _run_commands(urls, args)
+    results["message_cli"] = await _run_message_cli(urls, args)
+    print(
+        f"message_cli cold_p50={results['message_cli']['cold_start_to_sent_seconds']['p50']:.3f}s "
+        f"batch={args.message_batch} in {results['message_cli']['batch']['seconds']:.2f}s",
+        file=sys.stderr,
+    )
+    return results
+
+
+async def _run_monitor(urls: dict[str, str], size: int, args: argparse.Namespace) -> dict[str, Any]:
+    youtube_count = round(size * args.youtube_share)
+    twitch = [f"bench_t{index}" for index in range(size - youtube_count)]
+    youtube = [f"UCbench{index:06d}" for index in range(youtube_count)]
+    keys = [("twitch", channel) for channel in twitch] + [("youtube", channel) for channel in youtube]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = parse_config(_config_payload(urls, Path(workdir), twitch, youtube, args))
+        async with httpx.AsyncClient(base_url=urls["control"], timeout=60) as control:
+            await control.post("/reset", json={"twitch": twitch, "youtube": youtube})
+            transport = HttpTransport(config.http)
+            send_queue = SendQueue(config.send_queue, Bot(BOT_TOKEN, base_url=f"{urls['telegram']}/bot"))
+            await send_queue.start()
+            monitor = StreamMonitor(config, send_queue, transport)
+            gc.collect()
+            rss_before = _rss_bytes()
+
+            cycles: list[dict[str, Any]] = []
+            delivered = 0
+            try:
+                for cycle in range(args.cycles + 1):
+                    churn = (await control.post("/churn", json={"fraction": args.churn if cycle else 0})).json()
+                    before = (await control.get("/stats", params={"since": delivered})).json()
+                    started = time.perf_counter()
+                    await monitor._run_once(keys)
+                    monitor._flush()
+                    cycle_seconds = time.perf_counter() - started
+                    await send_queue.drain(DRAIN_TIMEOUT_SECONDS)
+
+                    after = (await control.get("/stats", params={"since": delivered})).json()
+                    delivered += len(after["deliveries"])
+                    cycles.append(
+                        {
+                            "cycle": cycle,
+                            "warmup": cycle == 0,
+                            "cycle_seconds": cycle_seconds,
+                            "requests": _delta(before["requests"], after["requests"]),
+                            "errors": _delta(before["errors"], after["errors"]),
+                            "changes": len(churn["changes"]),
+                            "notification_latencies": _latencies(churn, after["deliveries"]),
+                        }
+                    )
+            finally:
+                monitor.close()
+                await send_queue.stop()
+                await transport.aclose()
+            rss_after = _rss_bytes()
+
+    measured = [cycle for cycle in cycles if not cycle["warmup"]] or cycles
+    latencies = [latency for cycle in measured for latency in cycle["notification_latencies"]]
+    expected = sum(cycle["changes"] for cycle in measured)
+    return {
+        "subscriptions": size,
+        "twitch": len(twitch),
+        "youtube": len(youtube),
+        "cycles": [
+            {**cycle, "notification_latencies": _percentiles(cycle["notification_latencies"])} for cycle in cycles
+        ],
+        "summary": {
+            "cycle_seconds": _percentiles([cycle["cycle_seconds"] for cycle in measured]),
+            "requests_per_cycle": statistics.fmean(sum(cycle["requests"].values()) for cycle in measured),
+            "requests_per_cycle_by_upstream": {
+                upstream: statistics.fmean(cycle["requests"].get(upstream, 0) for cycle in measured)
+                for upstream in sorted({name for cycle in measured for name in cycle["requests"]})
+            },
+            "notifications_expected": expected,
+            "notifications_delivered": len(latencies),
+            "notification_latency_seconds": _percentiles(latencies),
+            "rss_bytes": rss_after,
+            "rss_growth_bytes": rss_after - rss_before,
+        },
+    }
+
+
+async def _run_commands(urls: dict[str, str], args: argparse.Namespace) -> dict[str, Any]:
+    os.environ["THADDEUS_RESOURCES_URL"] = f"{urls['github']}/raw"
+    with tempfile.TemporaryDirectory() as workdir:
+        config = parse_config(_config_payload(urls, Path(workdir), [], [], args))
+        transport = HttpTransport(config.http)
+        send_queue = SendQueue(config.send_queue, Bot(BOT_TOKEN, base_url=f"{urls['telegram']}/bot"))
+        await send_queue.start()
+        context = SimpleNamespace(
+            application=SimpleNamespace(
+                bot_data={
+                    "send_queue": send_queue,
+                    "resource_cache": ResourceCache(config.resource_cache, transport),
+                    "file_ids": FileIdStore(config.resource_cache.directory / "file_ids.json"),
+                    "dynamic_commands": config.dynamic_commands,
+                }
+            )
+        )
+
+        async with httpx.AsyncClient(base_url=urls["control"], timeout=60) as control:
+            before = (await control.get("/stats", params={"since": 1 << 30})).json()
+            commands = sorted(config.dynamic_commands)
+            latencies: dict[str, list[float]] = {command: [] for command in commands}
+            try:
+                for index in range(args.commands):
+                    command = commands[index % len(commands)]
+                    update = SimpleNamespace(
+                        effective_chat=SimpleNamespace(id=1),
+                        effective_message=SimpleNamespace(text=f"/{command}", message_thread_id=None),
+                    )
+                    started = time.perf_counter()
+                    await dynamic_command_router(update, context)
+                    latencies[command].append(time.perf_counter() - started)
+            finally:
+                await send_queue.stop()
+                await transport.aclose()
+            after = (await control.get("/stats", params={"since": 1 << 30})).json()
+
+    return {
+        "invocations": args.commands,
+        "latency_seconds": {command: _percentiles(values) for command, values in latencies.items()},
+        "requests": _delta(before["requests"], after["requests"]),
+    }
+
+
+async def _run_message_cli(urls: dict[str, str], args: argparse.Namespace) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as workdir:
+        config_url = "http://127.0.0.1:9/config.json"
+        cache_file = Path(workdir) / "config_cache.json"
+        payload = {"telegram": {"bot_token": BOT_TOKEN, "chat_id": "1", "api_url": urls["telegram"]}}
+        cache_file.write_text(json.dumps({"url": config_url, "fetched_at": time.time(), "payload": payload}))
+        env = {**os.environ, "THADDEUS_CONFIG_URL": config_url, "THADDEUS_CONFIG_CACHE": str(cache_file)}
+        command = [sys.executable, str(Path(__file__).parent.parent / "main.py"), "message"]
+
+        async def run(*extra: str, stdin: bytes | None = None) -> float:
+            started = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                *extra,
+                cwd=workdir,
+                env=env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+            )
+            _, stderr = await process.communicate(stdin)
+            if process.returncode != 0:
+                raise RuntimeError(f"message CLI failed: {stderr.decode(errors='replace')}")
+            return time.perf_counter() - started
+
+        single = [await run(f"bench {index}") for index in range(args.message_runs)]
+        lines = "".join(f"bench line {index}\n" for index in range(args.message_batch)).encode("utf-8")
+        batch = await run("--batch", stdin=lines)
+
+    return {
+        "cold_start_to_sent_seconds": _percentiles(single),
+        "batch": {"messages": args.message_batch, "seconds": batch},
+    }
+
+
+def _config_payload(
+    urls: dict[str, str], workdir: Path, twitch: list[str], youtube: list[str], args: argparse.Namespace
+) -> dict[str, Any]:
+    templates = {"live_message": "LIVE {channel}", "offline_message": "OFFLINE {channel}"}
+    subscriptions = [
+        {"id": f"twitch-{channel}", "platform": "twitch", "channel": channel, **templates} for channel in twitch
+    ]
+    subscriptions.extend(
+        {"id": f"youtube-{channel}", "platform": "youtube", "channel": channel, **templates} for channel in youtube
+    )
+    return {
+        "telegram": {"bot_token": BOT_TOKEN, "chat_id": "1"},
+        "twitch": {
+            "client_id": "bench",
+            "client_secret": "bench",
+            "api_url": f"{urls['twitch']}/helix",
+            "auth_url": f"{urls['twitch']}/oauth2",
+            "token_file": str(workdir / "twitch_token.json"),
+        },
+        "youtube": {
+            "api_key": "bench",
+            "api_url": f"{urls['youtube']}/youtube/v3",
+            "cache_file": str(workdir / "youtube_cache.json"),
+        },
+        "poll_concurrency": {"twitch": args.concurrency, "youtube": args.concurrency},
+        "poll_request_timeout_seconds": 300,
+        "log_polling": False,
+        "http": {"pool_size": args.pool_size, "timeout_seconds": 60, "backoff_seconds": 0.05, "max_backoff_seconds": 1},
+        "state_file": str(workdir / "notify.state"),
+        "state_backend": args.state_backend,
+        "send_queue": {
+            "file": str(workdir / "send_queue.json"),
+            "chat_messages_per_minute": 0,
+            "global_messages_per_second": 0,
+        },
+        "resource_cache": {"directory": str(workdir / "resource_cache")},
+        "config_reload_seconds": 0,
+        # Each cycle polls once, so an offline change must notify on its first offline check.
+        "offline_debounce": {"confirmations": 1},
+        "subscriptions": subscriptions,
+        "dynamic_commands": {
+            "guide": f"file:{RESOURCE_PATH} Read the guide.",
+            "handbook": " ".join(f"file:{path}" for path in RESOURCE_PATHS) + " The full handbook.",
+            "rules": "Be nice.",
+        },
+    }
+
+
+def _latencies(churn: dict[str, Any], deliveries: list[list[Any]]) -> list[float]:
+    delivered_at: dict[str, float] = {}
+    for delivered, text in deliveries:
+        delivered_at.setdefault(text, delivered)
+
+    latencies: list[float] = []
+    for change in churn["changes"]:
+        text = f"{'LIVE' if change['live'] else 'OFFLINE'} {change['channel']}"
+        if text in delivered_at:
+            latencies.append(delivered_at[text] - churn["at"])
+    return latencies
+
+
+def _percentiles(values: list[float]) -> dict[str, float | int]:
+    if not values:
+        return {"count": 0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "p50": ordered[(len(ordered) - 1) // 2],
+        "p95": ordered[min(len(ordered) - 1, round(0.95 * (len(ordered) - 1)))],
+        "max": ordered[-1],
+    }
+
+
+def _delta(before: dict[str, int], after: dict[str, int]) -> dict[str, int]:
+    return {
+        key: after.get(key, 0) - before.get(key, 0)
+        for key in sorted(after)
+        if after.get(key, 0) != before.get(key, 0)
+    }
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,54 @@
 import json
+import logging
 import os
+import random
+import re
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from urllib.parse import quote, urlparse
+from zoneinfo import ZoneInfo
+
+from .atomic_file import write_atomic
+
+if TYPE_CHECKING:
+    import httpx
+
+    from .http_transport import HttpTransport
+
+
+LOG = logging.getLogger("config")
+SUPPORTED_PLATFORMS = ("twitch", "youtube")
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+TEMPLATE_SAMPLE_VALUES = {
+    "platform": "twitch",
+    "display_name": "Channel",
+    "channel": "channel",
+    "title": "Title",
+    "status": "live",
+    "url": "https://example.com",
+}
+FILE_REF_PATTERN = re.compile(r"file:([^\s]+)")
+# One malformed login fails the whole batched Helix request, so it is rejected up front.
+TWITCH_LOGIN_PATTERN = re.compile(r"[a-zA-Z0-9_]{1,25}")
+MEDIA_TYPES = {
+    ".jpg": "photo",
+    ".jpeg": "photo",
+    ".png": "photo",
+    ".webp": "photo",
+    ".mp4": "video",
+    ".mov": "video",
+    ".mp3": "audio",
+    ".m4a": "audio",
+}
 
-import requests
+
+@dataclass
+class TelegramWebhookConfig:
+    url: str
+    secret: str
+    max_connections: int
 
 
 @dataclass
@@ -13,17 +56,150 @@ class TelegramConfig:
     bot_token: str
     chat_id: str
     stream_message_thread_id: int | None
+    api_url: str = "https://api.telegram.org"
+    webhook: TelegramWebhookConfig | None = None
+
+
+@dataclass
+class TwitchEventSubConfig:
+    callback_url: str
+    secret: str
+    sync_interval_seconds: float
 
 
 @dataclass
 class TwitchConfig:
     client_id: str
     client_secret: str
+    api_url: str
+    auth_url: str
+    eventsub: TwitchEventSubConfig | None
+    token_file: Path | None = None
+
+
+@dataclass
+class YouTubeWebSubConfig:
+    callback_url: str
+    secret: str
+    hub_url: str
+    lease_seconds: int
+    safety_poll_interval_seconds: float
 
 
 @dataclass
 class YouTubeConfig:
     api_key: str
+    api_url: str
+    cache_file: Path
+    recent_videos: int
+    websub: YouTubeWebSubConfig | None
+
+
+@dataclass
+class HttpConfig:
+    pool_size: int = 20
+    keepalive_seconds: float = 60.0
+    timeout_seconds: float = 20.0
+    max_retries: int = 3
+    backoff_seconds: float = 1.0
+    max_backoff_seconds: float = 30.0
+
+
+@dataclass
+class CircuitBreakerConfig:
+    failure_threshold: int = 3
+    open_seconds: float = 60.0
+    max_open_seconds: float = 3600.0
+
+
+@dataclass
+class HttpServerConfig:
+    host: str
+    port: int
+    read_timeout_seconds: float = 30.0
+
+
+@dataclass
+class ResourceCacheConfig:
+    directory: Path
+    ttl_seconds: float
+    stale_seconds: float
+    max_bytes: int
+
+
+@dataclass
+class SendQueueConfig:
+    file: Path | None
+    chat_messages_per_minute: float
+    chat_burst: int
+    global_messages_per_second: float
+    max_attempts: int
+
+
+@dataclass
+class ShardingConfig:
+    database: Path
+    shards: int
+    lease_seconds: float
+    heartbeat_seconds: float
+
+
+@dataclass
+class ScheduleConfig:
+    min_interval_seconds: float
+    max_interval_seconds: float
+    backoff_factor: float
+    hot_window_seconds: float
+    requests_per_minute: int
+
+
+@dataclass(frozen=True, slots=True)
+class MessageTemplate:
+    options: tuple[str, ...]
+
+    def render(self, values: dict[str, str]) -> str:
+        template = self.options[0] if len(self.options) == 1 else random.choice(self.options)
+        return template.format_map(values).strip()
+
+
+@dataclass(frozen=True, slots=True)
+class NotificationTarget:
+    state_key: str
+    chat_id: str
+    message_thread_id: int | None
+    live_message: MessageTemplate | None
+    offline_message: MessageTemplate | None
+
+
+@dataclass(frozen=True, slots=True)
+class OfflineDebounceConfig:
+    confirmations: int = 2
+    grace_seconds: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class Subscription:
+    id: str
+    platform: str
+    channel: str
+    key: tuple[str, str]
+    display_name: str
+    timezone: str
+    start_times: tuple[tuple[int, int, int], ...]
+    targets: tuple[NotificationTarget, ...]
+    offline_debounce: OfflineDebounceConfig
+
+
+@dataclass(frozen=True, slots=True)
+class CommandAttachment:
+    path: str
+    media_type: str
+
+
+@dataclass(frozen=True, slots=True)
+class CommandPlan:
+    text: str
+    attachments: tuple[CommandAttachment, ...]
 
 
 @dataclass
@@ -32,24 +208,82 @@ class AppConfig:
     twitch: TwitchConfig | None
     youtube: YouTubeConfig | None
     poll_interval_seconds: int
+    poll_concurrency: dict[str, int]
+    poll_request_timeout_seconds: float
+    status_max_age_seconds: float
+    schedule: ScheduleConfig
     log_polling: bool
+    http: HttpConfig
+    circuit_breaker: CircuitBreakerConfig
+    http_server: HttpServerConfig | None
     state_file: Path
-    subscriptions: list[dict[str, Any]]
-    dynamic_commands: dict[str, str]
+    state_backend: str
+    subscriptions: list[Subscription]
+    dynamic_commands: dict[str, CommandPlan]
+    resource_cache: ResourceCacheConfig
+    send_queue: SendQueueConfig
+    config_reload_seconds: float
+    sharding: ShardingConfig | None = None
 
 
-def load_config() -> AppConfig:
-    _load_dotenv(Path(".env"))
+def load_config(max_age_seconds: float = 0.0) -> AppConfig:
+    return parse_config(_load_config_payload(max_age_seconds))
 
-    config_url = os.getenv("THADDEUS_CONFIG_URL", "").strip()
-    if not config_url:
-        raise RuntimeError("THADDEUS_CONFIG_URL is required.")
 
-    payload = _fetch_remote_config(config_url)
+def load_telegram_config(max_age_seconds: float = 0.0) -> TelegramConfig:
+    return _parse_telegram_config(_load_config_payload(max_age_seconds)["telegram"])
+
+
+def save_config_snapshot(payload: dict[str, Any]) -> None:
+    _write_config_snapshot(_config_url(), payload)
+
+
+def parse_config(payload: Any) -> AppConfig:
+    if not isinstance(payload, dict):
+        raise RuntimeError("Config must be a JSON object.")
 
-    telegram_payload = payload["telegram"]
     twitch_payload = payload.get("twitch")
     youtube_payload = payload.get("youtube")
+    telegram = _parse_telegram_config(payload["telegram"])
+    poll_interval_seconds = int(payload.get("poll_interval_seconds", 60))
+
+    config = AppConfig(
+        telegram=telegram,
+        twitch=_parse_twitch_config(twitch_payload) if twitch_payload else None,
+        youtube=_parse_youtube_config(youtube_payload) if youtube_payload else None,
+        poll_interval_seconds=poll_interval_seconds,
+        poll_concurrency={
+            str(platform).lower(): max(1, int(limit))
+            for platform, limit in {"twitch": 4, "youtube": 4, **payload.get("poll_concurrency", {})}.items()
+        },
+        poll_request_timeout_seconds=float(payload.get("poll_request_timeout_seconds", 30)),
+        status_max_age_seconds=float(payload.get("status_max_age_seconds", poll_interval_seconds)),
+        schedule=_parse_schedule_config(payload.get("schedule", {}), poll_interval_seconds),
+        log_polling=bool(payload.get("log_polling", True)),
+        http=_parse_http_config(payload.get("http", {})),
+        circuit_breaker=_parse_circuit_breaker_config(payload.get("circuit_breaker", {})),
+        http_server=_parse_http_server_config(payload.get("http_server")),
+        state_file=Path(payload.get("state_file", "notify.json")),
+        state_backend=str(payload.get("state_backend", "json")).lower(),
+        subscriptions=_parse_subscriptions(
+            payload["subscriptions"],
+            telegram,
+            _parse_offline_debounce(payload.get("offline_debounce"), OfflineDebounceConfig()),
+        ),
+        dynamic_commands=_parse_dynamic_commands(payload.get("dynamic_commands", [])),
+        resource_cache=_parse_resource_cache_config(payload.get("resource_cache", {})),
+        send_queue=_parse_send_queue_config(payload.get("send_queue", {})),
+        config_reload_seconds=max(0.0, float(payload.get("config_reload_seconds", 300))),
+        sharding=_parse_sharding_config(payload.get("sharding")),
+    )
+    if config.telegram.webhook and not config.http_server:
+        raise RuntimeError("telegram.webhook requires http_server to be configured.")
+    if config.sharding:
+        _validate_sharding(config)
+    return config
+
+
+def _parse_telegram_config(telegram_payload: dict[str, Any]) -> TelegramConfig:
     chat_id, inferred_thread_id = _parse_chat_and_thread(telegram_payload["chat_id"])
     explicit_stream_thread_id = telegram_payload.get("stream_message_thread_id")
     legacy_thread_id = telegram_payload.get("message_thread_id")
@@ -58,38 +292,390 @@ def load_config() -> AppConfig:
         if explicit_stream_thread_id is not None
         else int(legacy_thread_id) if legacy_thread_id is not None else inferred_thread_id
     )
+    return TelegramConfig(
+        bot_token=telegram_payload["bot_token"],
+        chat_id=chat_id,
+        stream_message_thread_id=stream_message_thread_id,
+        api_url=str(telegram_payload.get("api_url", "https://api.telegram.org")).rstrip("/"),
+        webhook=_parse_telegram_webhook_config(telegram_payload.get("webhook")),
+    )
 
-    return AppConfig(
-        telegram=TelegramConfig(
-            bot_token=telegram_payload["bot_token"],
-            chat_id=chat_id,
-            stream_message_thread_id=stream_message_thread_id,
-        ),
-        twitch=TwitchConfig(
-            client_id=twitch_payload["client_id"],
-            client_secret=twitch_payload["client_secret"],
+
+def parse_start_time(value: str) -> tuple[int, int, int]:
+    parts = value.strip().lower().split()
+    if len(parts) != 2 or parts[0][:3] not in WEEKDAYS:
+        raise ValueError(f"Invalid start time {value!r}, expected e.g. 'fri 19:00'")
+
+    hour, _, minute = parts[1].partition(":")
+    if not 0 <= int(hour) < 24 or not 0 <= int(minute or 0) < 60:
+        raise ValueError(f"Invalid start time {value!r}, expected e.g. 'fri 19:00'")
+    return WEEKDAYS.index(parts[0][:3]), int(hour), int(minute or 0)
+
+
+def channel_key(platform: str, channel: str) -> tuple[str, str]:
+    platform = platform.lower()
+    channel = channel.strip()
+    return platform, channel.lower() if platform == "twitch" else channel
+
+
+def _parse_subscriptions(
+    raw_subscriptions: Any, telegram: TelegramConfig, offline_debounce: OfflineDebounceConfig
+) -> list[Subscription]:
+    if not isinstance(raw_subscriptions, list):
+        raise RuntimeError("subscriptions must be a list.")
+
+    subscriptions: list[Subscription] = []
+    seen_ids: set[str] = set()
+    for sub in raw_subscriptions:
+        if not isinstance(sub, dict):
+            raise RuntimeError(f"Invalid subscription: {sub!r}")
+        for field_name in ("id", "platform", "channel"):
+            if not isinstance(sub.get(field_name), str) or not sub[field_name].strip():
+                raise RuntimeError(f"Subscription {sub.get('id')!r} is missing {field_name}.")
+        sub_id = sub["id"]
+        if sub["platform"].lower() not in SUPPORTED_PLATFORMS:
+            raise RuntimeError(f"Subscription {sub_id!r} has unsupported platform {sub['platform']!r}.")
+        if sub_id in seen_ids:
+            raise RuntimeError(f"Duplicate subscription id {sub_id!r}.")
+        seen_ids.add(sub_id)
+        key = channel_key(sub["platform"], sub["channel"])
+        if key[0] == "twitch" and not TWITCH_LOGIN_PATTERN.fullmatch(key[1]):
+            raise RuntimeError(f"Subscription {sub_id!r} has an invalid Twitch login {sub['channel']!r}.")
+
+        timezone = str(sub.get("timezone", "UTC"))
+        try:
+            ZoneInfo(timezone)
+            start_times = tuple(parse_start_time(value) for value in sub.get("start_times", []))
+        except Exception as exc:
+            raise RuntimeError(f"Subscription {sub_id!r} has an invalid schedule: {exc}") from exc
+
+        subscriptions.append(
+            Subscription(
+                id=sub_id,
+                platform=sub["platform"].lower(),
+                channel=sub["channel"],
+                key=key,
+                display_name=str(sub.get("display_name", sub["channel"])),
+                timezone=timezone,
+                start_times=start_times,
+                targets=_parse_targets(sub, telegram),
+                offline_debounce=_parse_offline_debounce(sub.get("offline_debounce"), offline_debounce),
+            )
         )
-        if twitch_payload
-        else None,
-        youtube=YouTubeConfig(api_key=youtube_payload["api_key"]) if youtube_payload else None,
-        poll_interval_seconds=int(payload.get("poll_interval_seconds", 60)),
-        log_polling=bool(payload.get("log_polling", True)),
-        state_file=Path(payload.get("state_file", "notify.json")),
-        subscriptions=payload["subscriptions"],
-        dynamic_commands=_parse_dynamic_commands(payload.get("dynamic_commands", [])),
+    return subscriptions
+
+
+def _parse_offline_debounce(raw_debounce: Any, defaults: OfflineDebounceConfig) -> OfflineDebounceConfig:
+    if not isinstance(raw_debounce, dict):
+        return defaults
+
+    return OfflineDebounceConfig(
+        confirmations=max(1, int(raw_debounce.get("confirmations", defaults.confirmations))),
+        grace_seconds=max(0.0, float(raw_debounce.get("grace_seconds", defaults.grace_seconds))),
+    )
+
+
+def _parse_targets(sub: dict[str, Any], telegram: TelegramConfig) -> tuple[NotificationTarget, ...]:
+    sub_id = sub["id"]
+    live_message = _parse_template(sub_id, sub.get("live_message"))
+    offline_message = _parse_template(sub_id, sub.get("offline_message"))
+    default = (telegram.chat_id, telegram.stream_message_thread_id)
+    if "targets" not in sub:
+        return (NotificationTarget(sub_id, *default, live_message, offline_message),)
+
+    raw_targets = sub["targets"]
+    if not isinstance(raw_targets, list) or not raw_targets:
+        raise RuntimeError(f"Subscription {sub_id!r} targets must be a non-empty list.")
+
+    targets: list[NotificationTarget] = []
+    for raw_target in raw_targets:
+        if not isinstance(raw_target, dict) or not str(raw_target.get("chat_id", "")).strip():
+            raise RuntimeError(f"Subscription {sub_id!r} has a target without chat_id.")
+        chat_id, inferred_thread_id = _parse_chat_and_thread(raw_target["chat_id"])
+        thread_id = raw_target.get("message_thread_id")
+        thread_id = int(thread_id) if thread_id is not None else inferred_thread_id
+        if any((target.chat_id, target.message_thread_id) == (chat_id, thread_id) for target in targets):
+            raise RuntimeError(f"Subscription {sub_id!r} has a duplicate target {raw_target['chat_id']!r}.")
+
+        if (chat_id, thread_id) == default:
+            state_key = sub_id
+        else:
+            state_key = f"{sub_id}@{chat_id}" + (f"/{thread_id}" if thread_id is not None else "")
+        templates = {
+            name: _parse_template(sub_id, raw_target[name]) if name in raw_target else fallback
+            for name, fallback in (("live_message", live_message), ("offline_message", offline_message))
+        }
+        targets.append(NotificationTarget(state_key, chat_id, thread_id, **templates))
+    return tuple(targets)
+
+
+def _parse_template(sub_id: str, raw_template: Any) -> MessageTemplate | None:
+    if isinstance(raw_template, str):
+        raw_template = [raw_template]
+    if not isinstance(raw_template, list):
+        return None
+
+    options = tuple(item for item in raw_template if isinstance(item, str) and item.strip())
+    for option in options:
+        try:
+            option.format_map(TEMPLATE_SAMPLE_VALUES)
+        except (KeyError, IndexError, ValueError, AttributeError) as exc:
+            placeholders = ", ".join(f"{{{name}}}" for name in TEMPLATE_SAMPLE_VALUES)
+            raise RuntimeError(
+                f"Subscription {sub_id!r} has an invalid template {option!r} ({exc!r}); use {placeholders}."
+            ) from exc
+    return MessageTemplate(options) if options else None
+
+
+def _parse_telegram_webhook_config(raw_webhook: Any) -> TelegramWebhookConfig | None:
+    if not isinstance(raw_webhook, dict):
+        return None
+
+    secret = str(raw_webhook["secret"])
+    if not 1 <= len(secret) <= 256 or re.fullmatch(r"[A-Za-z0-9_-]+", secret) is None:
+        raise RuntimeError("telegram.webhook.secret must be 1-256 characters of A-Z, a-z, 0-9, _ and -.")
+    return TelegramWebhookConfig(
+        url=str(raw_webhook["url"]),
+        secret=secret,
+        max_connections=min(100, max(1, int(raw_webhook.get("max_connections", 40)))),
+    )
+
+
+def _parse_twitch_config(twitch_payload: dict[str, Any]) -> TwitchConfig:
+    eventsub_payload = twitch_payload.get("eventsub")
+    eventsub = None
+    if eventsub_payload:
+        secret = str(eventsub_payload["secret"])
+        if not 10 <= len(secret) <= 100:
+            raise RuntimeError("twitch.eventsub.secret must be 10-100 characters long.")
+        eventsub = TwitchEventSubConfig(
+            callback_url=eventsub_payload["callback_url"],
+            secret=secret,
+            sync_interval_seconds=float(eventsub_payload.get("sync_interval_seconds", 600)),
+        )
+
+    token_file = twitch_payload.get("token_file", "twitch_token.json")
+    return TwitchConfig(
+        client_id=twitch_payload["client_id"],
+        client_secret=twitch_payload["client_secret"],
+        api_url=twitch_payload.get("api_url", "https://api.twitch.tv/helix").rstrip("/"),
+        auth_url=twitch_payload.get("auth_url", "https://id.twitch.tv/oauth2").rstrip("/"),
+        eventsub=eventsub,
+        token_file=Path(token_file) if token_file else None,
+    )
+
+
+def _parse_youtube_config(youtube_payload: dict[str, Any]) -> YouTubeConfig:
+    websub_payload = youtube_payload.get("websub")
+    websub = None
+    if websub_payload:
+        websub = YouTubeWebSubConfig(
+            callback_url=websub_payload["callback_url"],
+            secret=str(websub_payload["secret"]),
+            hub_url=websub_payload.get("hub_url", "https://pubsubhubbub.appspot.com/subscribe"),
+            lease_seconds=int(websub_payload.get("lease_seconds", 432000)),
+            safety_poll_interval_seconds=float(websub_payload.get("safety_poll_interval_seconds", 3600)),
+        )
+
+    return YouTubeConfig(
+        api_key=youtube_payload["api_key"],
+        api_url=youtube_payload.get("api_url", "https://www.googleapis.com/youtube/v3").rstrip("/"),
+        cache_file=Path(youtube_payload.get("cache_file", "youtube_cache.json")),
+        recent_videos=int(youtube_payload.get("recent_videos", 5)),
+        websub=websub,
+    )
+
+
+def _parse_http_server_config(raw_server: Any) -> HttpServerConfig | None:
+    if not isinstance(raw_server, dict):
+        return None
+
+    return HttpServerConfig(
+        host=str(raw_server.get("host", "0.0.0.0")),
+        port=int(raw_server.get("port", 8080)),
+        read_timeout_seconds=max(0.1, float(raw_server.get("read_timeout_seconds", 30))),
+    )
+
+
+def _parse_http_config(raw_http: Any) -> HttpConfig:
+    defaults = HttpConfig()
+    if not isinstance(raw_http, dict):
+        return defaults
+
+    return HttpConfig(
+        pool_size=max(1, int(raw_http.get("pool_size", defaults.pool_size))),
+        keepalive_seconds=float(raw_http.get("keepalive_seconds", defaults.keepalive_seconds)),
+        timeout_seconds=float(raw_http.get("timeout_seconds", defaults.timeout_seconds)),
+        max_retries=max(0, int(raw_http.get("max_retries", defaults.max_retries))),
+        backoff_seconds=float(raw_http.get("backoff_seconds", defaults.backoff_seconds)),
+        max_backoff_seconds=float(raw_http.get("max_backoff_seconds", defaults.max_backoff_seconds)),
+    )
+
+
+def _parse_circuit_breaker_config(raw_breaker: Any) -> CircuitBreakerConfig:
+    defaults = CircuitBreakerConfig()
+    if not isinstance(raw_breaker, dict):
+        return defaults
+
+    return CircuitBreakerConfig(
+        failure_threshold=max(1, int(raw_breaker.get("failure_threshold", defaults.failure_threshold))),
+        open_seconds=float(raw_breaker.get("open_seconds", defaults.open_seconds)),
+        max_open_seconds=float(raw_breaker.get("max_open_seconds", defaults.max_open_seconds)),
+    )
+
+
+def _parse_schedule_config(raw_schedule: Any, poll_interval_seconds: int) -> ScheduleConfig:
+    if not isinstance(raw_schedule, dict):
+        raw_schedule = {}
+
+    return ScheduleConfig(
+        min_interval_seconds=float(raw_schedule.get("min_interval_seconds", min(30, poll_interval_seconds))),
+        max_interval_seconds=float(raw_schedule.get("max_interval_seconds", max(900, poll_interval_seconds))),
+        backoff_factor=max(1.0, float(raw_schedule.get("backoff_factor", 1.5))),
+        hot_window_seconds=float(raw_schedule.get("hot_window_seconds", 1800)),
+        requests_per_minute=max(0, int(raw_schedule.get("requests_per_minute", 0))),
     )
 
 
+def _parse_resource_cache_config(raw_cache: Any) -> ResourceCacheConfig:
+    if not isinstance(raw_cache, dict):
+        raw_cache = {}
+
+    return ResourceCacheConfig(
+        directory=Path(raw_cache.get("directory", "resource_cache")),
+        ttl_seconds=float(raw_cache.get("ttl_seconds", 300)),
+        stale_seconds=float(raw_cache.get("stale_seconds", 86400)),
+        max_bytes=int(raw_cache.get("max_bytes", 100 * 1024 * 1024)),
+    )
+
+
+def _parse_send_queue_config(raw_queue: Any) -> SendQueueConfig:
+    if not isinstance(raw_queue, dict):
+        raw_queue = {}
+
+    queue_file = raw_queue.get("file", "send_queue.json")
+    return SendQueueConfig(
+        file=Path(queue_file) if queue_file else None,
+        chat_messages_per_minute=float(raw_queue.get("chat_messages_per_minute", 20)),
+        chat_burst=max(1, int(raw_queue.get("chat_burst", 3))),
+        global_messages_per_second=float(raw_queue.get("global_messages_per_second", 25)),
+        max_attempts=max(1, int(raw_queue.get("max_attempts", 5))),
+    )
+
+
+def _parse_sharding_config(raw_sharding: Any) -> ShardingConfig | None:
+    if not isinstance(raw_sharding, dict):
+        return None
+
+    lease_seconds = float(raw_sharding.get("lease_seconds", 30))
+    return ShardingConfig(
+        database=Path(raw_sharding.get("database", "shards.sqlite3")),
+        shards=max(1, int(raw_sharding.get("shards", 64))),
+        lease_seconds=lease_seconds,
+        heartbeat_seconds=float(raw_sharding.get("heartbeat_seconds", lease_seconds / 3)),
+    )
+
+
+def _validate_sharding(config: AppConfig) -> None:
+    if config.state_backend != "sqlite":
+        raise RuntimeError("sharding requires state_backend sqlite on a path shared by all workers.")
+    if config.twitch and config.twitch.eventsub:
+        raise RuntimeError("sharding does not support twitch.eventsub.")
+    if config.youtube and config.youtube.websub:
+        raise RuntimeError("sharding does not support youtube.websub.")
+    if config.sharding.heartbeat_seconds >= config.sharding.lease_seconds:
+        raise RuntimeError("sharding.heartbeat_seconds must be shorter than sharding.lease_seconds.")
+
+
+def _config_url() -> str:
+    _load_dotenv(Path(".env"))
+
+    config_url = os.getenv("THADDEUS_CONFIG_URL", "").strip()
+    if not config_url:
+        raise RuntimeError("THADDEUS_CONFIG_URL is required.")
+    return config_url
+
+
+def _load_config_payload(max_age_seconds: float) -> dict[str, Any]:
+    config_url = _config_url()
+    snapshot = _read_config_snapshot(config_url)
+    if snapshot is not None:
+        age = time.time() - snapshot["fetched_at"]
+        if age <= max_age_seconds:
+            LOG.info("Using config snapshot fetched %.0fs ago", age)
+            return snapshot["payload"]
+
+    try:
+        payload = _fetch_remote_config(config_url)
+        parse_config(payload)
+    except Exception:
+        if snapshot is None:
+            raise
+        LOG.exception("Failed to load remote config, using the last known good snapshot")
+        return snapshot["payload"]
+    _write_config_snapshot(config_url, payload)
+    return payload
+
+
+def _config_snapshot_path() -> Path:
+    return Path(os.getenv("THADDEUS_CONFIG_CACHE", "config_cache.json"))
+
+
+def _read_config_snapshot(config_url: str) -> dict[str, Any] | None:
+    path = _config_snapshot_path()
+    try:
+        snapshot = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(snapshot, dict)
+        or snapshot.get("url") != config_url
+        or not isinstance(snapshot.get("payload"), dict)
+    ):
+        return None
+    return snapshot
+
+
+def _write_config_snapshot(config_url: str, payload: dict[str, Any]) -> None:
+    snapshot = {"url": config_url, "fetched_at": time.time(), "payload": payload}
+    try:
+        write_atomic(_config_snapshot_path(), json.dumps(snapshot).encode("utf-8"), mode=0o600)
+    except OSError:
+        LOG.exception("Failed to save config snapshot to %s", _config_snapshot_path())
+
+
 def _fetch_remote_config(config_url: str) -> dict[str, Any]:
+    from .http_transport import HttpTransport
+
     normalized_url = _normalize_config_url(config_url)
     headers, auth = _build_auth()
 
-    response = requests.get(normalized_url, headers=headers, auth=auth, timeout=30)
+    with HttpTransport(HttpConfig(timeout_seconds=30)) as transport:
+        response = transport.request_sync("GET", normalized_url, headers=headers, auth=auth)
     response.raise_for_status()
     return response.json()
 
 
-def fetch_remote_resource(resource_path: str) -> tuple[bytes, str]:
+async def fetch_remote_config(
+    transport: "HttpTransport", etag: str | None = None
+) -> tuple[dict[str, Any] | None, str | None]:
+    normalized_url = _normalize_config_url(_config_url())
+    headers, auth = _build_auth()
+    if etag:
+        headers["If-None-Match"] = etag
+
+    response = await transport.request("GET", normalized_url, headers=headers, auth=auth, timeout=30)
+    if response.status_code == 304:
+        return None, etag
+    response.raise_for_status()
+    return response.json(), response.headers.get("ETag")
+
+
+async def fetch_remote_resource(
+    resource_path: str,
+    transport: "HttpTransport",
+    headers: dict[str, str] | None = None,
+) -> "httpx.Response":
     _load_dotenv(Path(".env"))
     resources_base_url = os.getenv("THADDEUS_RESOURCES_URL", "").strip()
     if not resources_base_url:
@@ -98,12 +684,14 @@ def fetch_remote_resource(resource_path: str) -> tuple[bytes, str]:
     normalized_base = _normalize_remote_url(resources_base_url)
     normalized_path = _normalize_resource_path(resource_path)
     resource_url = _build_resource_url(normalized_base, normalized_path)
-    headers, auth = _build_auth()
+    auth_headers, auth = _build_auth()
 
-    response = requests.get(resource_url, headers=headers, auth=auth, timeout=30)
-    response.raise_for_status()
-    filename = Path(normalized_path).name or "resource.bin"
-    return response.content, filename
+    response = await transport.request(
+        "GET", resource_url, headers={**auth_headers, **(headers or {})}, auth=auth, timeout=30
+    )
+    if response.status_code != 304:
+        response.raise_for_status()
+    return response
 
 
 def _build_auth() -> tuple[dict[str, str], tuple[str, str] | None]:
@@ -154,8 +742,8 @@ def _build_resource_url(base_url: str, resource_path: str) -> str:
     return f"{base_url.rstrip('/')}/{encoded_path}"
 
 
-def _parse_dynamic_commands(raw_commands: Any) -> dict[str, str]:
-    parsed: dict[str, str] = {}
+def _parse_dynamic_commands(raw_commands: Any) -> dict[str, CommandPlan]:
+    parsed: dict[str, CommandPlan] = {}
     if isinstance(raw_commands, dict):
         for command, message in raw_commands.items():
             _add_dynamic_command(parsed, command, message)
@@ -170,14 +758,20 @@ def _parse_dynamic_commands(raw_commands: Any) -> dict[str, str]:
     return parsed
 
 
-def _add_dynamic_command(parsed: dict[str, str], command: Any, message: Any) -> None:
+def _add_dynamic_command(parsed: dict[str, CommandPlan], command: Any, message: Any) -> None:
     if not isinstance(command, str) or not isinstance(message, str):
         return
 
     normalized_command = command.strip().lstrip("/").lower()
     if not normalized_command:
         return
-    parsed[normalized_command] = message.strip()
+    parsed[normalized_command] = CommandPlan(
+        text=FILE_REF_PATTERN.sub("", message).strip(),
+        attachments=tuple(
+            CommandAttachment(path=path, media_type=MEDIA_TYPES.get(Path(path).suffix.lower(), "document"))
+            for path in FILE_REF_PATTERN.findall(message)
+        ),
+    )
 
 
 def _load_dotenv(path: Path) -> None:
@@ -0,0 +1,27 @@
+import os
+from pathlib import Path
+
+
+def write_atomic(path: Path, content: bytes, mode: int | None = None) -> None:
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "wb") as handle:
+        if mode is not None:
+            os.fchmod(handle.fileno(), mode)
+        handle.write(content)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory: Path) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,69 @@
+import http.client
+import json
+import logging
+import time
+from typing import Any
+from urllib.parse import urlencode, urlsplit
+
+
+LOG = logging.getLogger("bot-api")
+MAX_ATTEMPTS = 5
+
+
+class BotApiError(RuntimeError):
+    def __init__(self, message: str, status: int):
+        super().__init__(message)
+        self.status = status
+
+
+class BotApiClient:
+    def __init__(self, api_url: str, token: str, timeout: float = 20.0):
+        parts = urlsplit(api_url)
+        self._connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host = parts.netloc
+        self._path = f"{parts.path.rstrip('/')}/bot{token}"
+        self._timeout = timeout
+        self._connection: http.client.HTTPConnection | None = None
+
+    def call(self, method: str, **params: Any) -> Any:
+        body = urlencode({key: value for key, value in params.items() if value is not None})
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                status, payload = self._post(method, body)
+            except (OSError, http.client.HTTPException) as exc:
+                self.close()
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                LOG.warning("Telegram %s failed (%s), retrying", method, exc)
+                time.sleep(min(attempt, 5))
+                continue
+
+            if payload.get("ok"):
+                return payload.get("result")
+            retry_after = payload.get("parameters", {}).get("retry_after")
+            if status == 429 and retry_after is not None and attempt < MAX_ATTEMPTS:
+                LOG.warning("Telegram flood limit hit, retrying in %ss", retry_after)
+                time.sleep(float(retry_after))
+                continue
+            raise BotApiError(f"Telegram {method} failed: {payload.get('description', status)}", status)
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _post(self, method: str, body: str) -> tuple[int, dict[str, Any]]:
+        if self._connection is None:
+            self._connection = self._connection_class(self._host, timeout=self._timeout)
+        self._connection.request(
+            "POST",
+            f"{self._path}/{method}",
+            body=body,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        response = self._connection.getresponse()
+        content = response.read()
+        try:
+            return response.status, json.loads(content)
+        except ValueError:
+            return response.status, {"ok": False, "description": f"HTTP {response.status}"}
@@ -0,0 +1,49 @@
+import random
+
+from .app_config import CircuitBreakerConfig
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, config: CircuitBreakerConfig):
+        self._config = config
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.retry_at = 0.0
+        self.last_error: str | None = None
+
+    def blocked(self, now: float) -> bool:
+        return self.state != CLOSED and now < self.retry_at
+
+    def acquire(self, now: float) -> None:
+        if self.state == CLOSED:
+            return
+        # One probe at a time; a probe that never reports back frees the slot after open_seconds.
+        self.state = HALF_OPEN
+        self.retry_at = now + self._config.open_seconds
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.last_error = None
+
+    def record_failure(self, error: BaseException, now: float) -> None:
+        self.failures += 1
+        self.last_error = str(error) or type(error).__name__
+        if self.state == OPEN or (self.state == CLOSED and self.failures < self._config.failure_threshold):
+            return
+
+        self.trips += 1
+        backoff = min(self._config.max_open_seconds, self._config.open_seconds * 2 ** (self.trips - 1))
+        self.retry_at = now + random.uniform(backoff / 2, backoff)
+        self.state = OPEN
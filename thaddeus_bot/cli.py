@@ -1,11 +1,12 @@
 import argparse
-import asyncio
 import sys
+from typing import Iterable
 
-from telegram import Bot
+from .app_config import load_telegram_config
 
-from .app_config import load_config
-from .telegram_runtime import run_bot
+
+# The message command only needs the Telegram section, so it may reuse a recent config snapshot.
+MESSAGE_CONFIG_MAX_AGE_SECONDS = 3600.0
 
 
 def parse_args(argv: list[str]) -> argparse.Namespace:
@@ -15,32 +16,82 @@ def parse_args(argv: list[str]) -> argparse.Namespace:
     run_parser = subparsers.add_parser("run", help="Run the Telegram bot")
     run_parser.set_defaults(command="run")
 
+    worker_parser = subparsers.add_parser("worker", help="Poll a share of the subscriptions without Telegram updates")
+    worker_parser.set_defaults(command="worker")
+
     message_parser = subparsers.add_parser(
         "message", help="Send a message to the configured Telegram chat"
     )
-    message_parser.add_argument("text", nargs="+", help="Message text")
+    message_parser.add_argument("text", nargs="*", help="Message text")
+    message_parser.add_argument("--stdin", action="store_true", help="Read the message text from stdin")
+    message_parser.add_argument(
+        "--batch", action="store_true", help="Send each non-empty stdin line as a separate message"
+    )
+    message_parser.add_argument(
+        "--refresh-config", action="store_true", help="Fetch the remote config instead of using the local snapshot"
+    )
 
     if not argv:
         return parser.parse_args(["run"])
-    return parser.parse_args(argv)
-
-
-def send_message(text: str) -> None:
-    config = load_config()
-    bot = Bot(token=config.telegram.bot_token)
-    asyncio.run(
-        bot.send_message(
-            chat_id=config.telegram.chat_id,
-            message_thread_id=config.telegram.stream_message_thread_id,
-            text=text,
-        )
-    )
-    print("Message sent.")
+    args = parser.parse_args(argv)
+    if args.command == "message" and not args.text and not (args.stdin or args.batch):
+        parser.error("message needs text, --stdin or --batch")
+    return args
+
+
+def send_messages(texts: Iterable[str], refresh_config: bool = False) -> int:
+    from .bot_api import BotApiClient, BotApiError
+
+    texts = [text for text in texts if text.strip()]
+    max_age = 0.0 if refresh_config else MESSAGE_CONFIG_MAX_AGE_SECONDS
+    config = load_telegram_config(max_age)
+    client = BotApiClient(config.api_url, config.bot_token)
+    sent = 0
+    try:
+        while sent < len(texts):
+            try:
+                client.call(
+                    "sendMessage",
+                    chat_id=config.chat_id,
+                    message_thread_id=config.stream_message_thread_id,
+                    text=texts[sent],
+                )
+            except BotApiError as exc:
+                # A cached snapshot may hold a rotated bot token; retry once with a fresh config.
+                if exc.status != 401 or max_age == 0:
+                    raise
+                max_age = 0.0
+                config = load_telegram_config(max_age)
+                client.close()
+                client = BotApiClient(config.api_url, config.bot_token)
+                continue
+            sent += 1
+    finally:
+        client.close()
+    return sent
+
+
+def _message_texts(args: argparse.Namespace) -> list[str]:
+    if args.batch:
+        return [line.rstrip("\n") for line in sys.stdin]
+    if args.stdin:
+        return [sys.stdin.read().strip()]
+    return [" ".join(args.text).strip()]
 
 
 def run_cli() -> None:
     args = parse_args(sys.argv[1:])
     if args.command == "message":
-        send_message(" ".join(args.text).strip())
+        texts = _message_texts(args)
+        sent = send_messages(texts, refresh_config=args.refresh_config)
+        print("Message sent." if sent == 1 else f"Sent {sent} messages.")
         return
+    if args.command == "worker":
+        from .worker import run_worker
+
+        run_worker()
+        return
+
+    from .telegram_runtime import run_bot
+
     run_bot()
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from dataclasses import fields
+from typing import Awaitable, Callable
+
+from .app_config import AppConfig, fetch_remote_config, parse_config, save_config_snapshot
+from .http_transport import HttpTransport
+
+
+LOG = logging.getLogger("config-reloader")
+RELOADABLE_FIELDS = ("subscriptions", "dynamic_commands")
+
+
+class ConfigReloader:
+    def __init__(
+        self,
+        config: AppConfig,
+        transport: HttpTransport,
+        on_reload: Callable[[AppConfig], Awaitable[None]],
+    ):
+        self._config = config
+        self._transport = transport
+        self._on_reload = on_reload
+        self._etag: str | None = None
+
+    async def run(self) -> None:
+        # The process may have started from a snapshot, so revalidate right away.
+        await self.reload()
+        while self._config.config_reload_seconds:
+            await asyncio.sleep(self._config.config_reload_seconds)
+            await self.reload()
+
+    async def reload(self) -> bool:
+        try:
+            payload, self._etag = await fetch_remote_config(self._transport, self._etag)
+        except Exception:
+            LOG.exception("Failed to fetch remote config")
+            return False
+        if payload is None:
+            return False
+
+        try:
+            new_config = parse_config(payload)
+        except Exception:
+            LOG.exception("Rejected invalid remote config, keeping the running one")
+            return False
+        save_config_snapshot(payload)
+
+        restart_fields = [
+            field.name
+            for field in fields(AppConfig)
+            if field.name not in RELOADABLE_FIELDS
+            and getattr(new_config, field.name) != getattr(self._config, field.name)
+        ]
+        if restart_fields:
+            LOG.warning("Config changes to %s need a restart to take effect", ", ".join(restart_fields))
+
+        changes = _describe_changes(self._config, new_config)
+        if not changes:
+            return False
+
+        try:
+            await self._on_reload(new_config)
+        except Exception:
+            LOG.exception("Failed to apply remote config, keeping the running one")
+            return False
+
+        LOG.info("Config reloaded: %s", "; ".join(changes))
+        return True
+
+
+def _describe_changes(old: AppConfig, new: AppConfig) -> list[str]:
+    changes: list[str] = []
+    old_subs = {sub.id: sub for sub in old.subscriptions}
+    new_subs = {sub.id: sub for sub in new.subscriptions}
+    sub_changes = _diff(old_subs, new_subs)
+    if sub_changes:
+        changes.append(f"subscriptions {sub_changes}")
+    command_changes = _diff(old.dynamic_commands, new.dynamic_commands)
+    if command_changes:
+        changes.append(f"dynamic commands {command_changes}")
+    return changes
+
+
+def _diff(old: dict, new: dict) -> str:
+    added = new.keys() - old.keys()
+    removed = old.keys() - new.keys()
+    changed = {key for key in old.keys() & new.keys() if old[key] != new[key]}
+    if not added and not removed and not changed:
+        return ""
+    return f"+{len(added)} -{len(removed)} ~{len(changed)}"
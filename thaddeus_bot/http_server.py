@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from .app_config import HttpServerConfig
+
+
+LOG = logging.getLogger("http-server")
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 1024 * 1024
+
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: dict[str, list[str]]
+    headers: dict[str, str]
+    body: bytes
+
+
+@dataclass
+class HttpResponse:
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+    headers: dict[str, str] = field(default_factory=dict)
+
+
+Handler = Callable[[HttpRequest], Awaitable[HttpResponse]]
+
+
+class HttpServer:
+    def __init__(self, config: HttpServerConfig):
+        self._config = config
+        self._routes: dict[tuple[str, str], Handler] = {}
+        self._server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int | None:
+        if self._server is None or not self._server.sockets:
+            return None
+        return self._server.sockets[0].getsockname()[1]
+
+    def add_route(self, method: str, path: str, handler: Handler) -> None:
+        self._routes[(method.upper(), path)] = handler
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self._config.host, self._config.port)
+        LOG.info("HTTP server listening on %s:%s", self._config.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                # Bounds both a slow request and an idle keep-alive connection.
+                request = await asyncio.wait_for(self._read_request(reader), self._config.read_timeout_seconds)
+                if request is None:
+                    break
+                response = await self._dispatch(request)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                self._write_response(writer, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> HttpRequest | None:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+        headers: dict[str, str] = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ValueError("Too many request headers")
+
+        length = int(headers.get("content-length", "0"))
+        if length > MAX_BODY_BYTES:
+            raise ValueError("Request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+        parsed = urlsplit(target)
+        return HttpRequest(method.upper(), parsed.path, parse_qs(parsed.query), headers, body)
+
+    async def _dispatch(self, request: HttpRequest) -> HttpResponse:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in self._routes):
+                return HttpResponse(status=405)
+            return HttpResponse(status=404)
+
+        try:
+            return await handler(request)
+        except Exception:
+            LOG.exception("Unhandled error for %s %s", request.method, request.path)
+            return HttpResponse(status=500)
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, response: HttpResponse, keep_alive: bool) -> None:
+        reason = HTTPStatus(response.status).phrase
+        headers = {
+            "Content-Type": response.content_type,
+            "Content-Length": str(len(response.body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+            **response.headers,
+        }
+        head = f"HTTP/1.1 {response.status} {reason}\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        )
+        writer.write(head.encode("latin-1") + b"\r\n" + response.body)
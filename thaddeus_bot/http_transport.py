@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any
+
+import httpx
+
+from .metrics import HTTP_REQUEST_SECONDS, HTTP_REQUESTS
+
+if TYPE_CHECKING:
+    from .app_config import HttpConfig
+
+
+LOG = logging.getLogger("http-transport")
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# The request was never sent, so even a POST is safe to repeat.
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Statuses where the server says it did not process the request and when to come back.
+UNPROCESSED_STATUSES = frozenset({429, 503})
+
+
+class HttpTransport:
+    def __init__(self, config: "HttpConfig"):
+        self._config = config
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._sync_clients: dict[str, httpx.Client] = {}
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        client = self._client(url)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                _record_request(url, started, "error")
+                delay = self._retry_delay(method, attempt, None, exc)
+                if delay is None:
+                    raise
+                LOG.warning("%s %s failed (%s), retrying in %.1fs", method, _host_key(url), exc, delay)
+            else:
+                _record_request(url, started, str(response.status_code))
+                delay = self._retry_delay(method, attempt, response)
+                if delay is None:
+                    return response
+                LOG.warning(
+                    "%s %s returned %s, retrying in %.1fs", method, _host_key(url), response.status_code, delay
+                )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def request_sync(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        client = self._sync_client(url)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = client.request(method, url, **kwargs)
+            except httpx.TransportError as exc:
+                _record_request(url, started, "error")
+                delay = self._retry_delay(method, attempt, None, exc)
+                if delay is None:
+                    raise
+                LOG.warning("%s %s failed (%s), retrying in %.1fs", method, _host_key(url), exc, delay)
+            else:
+                _record_request(url, started, str(response.status_code))
+                delay = self._retry_delay(method, attempt, response)
+                if delay is None:
+                    return response
+                LOG.warning(
+                    "%s %s returned %s, retrying in %.1fs", method, _host_key(url), response.status_code, delay
+                )
+            time.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
+        self.close()
+
+    def close(self) -> None:
+        clients = list(self._sync_clients.values())
+        self._sync_clients.clear()
+        for client in clients:
+            client.close()
+
+    def __enter__(self) -> "HttpTransport":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _client(self, url: str) -> httpx.AsyncClient:
+        key = _host_key(url)
+        client = self._clients.get(key)
+        if client is None:
+            client = httpx.AsyncClient(limits=self._limits(), timeout=self._config.timeout_seconds)
+            self._clients[key] = client
+        return client
+
+    def _sync_client(self, url: str) -> httpx.Client:
+        key = _host_key(url)
+        client = self._sync_clients.get(key)
+        if client is None:
+            client = httpx.Client(limits=self._limits(), timeout=self._config.timeout_seconds)
+            self._sync_clients[key] = client
+        return client
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self._config.pool_size,
+            max_keepalive_connections=self._config.pool_size,
+            keepalive_expiry=self._config.keepalive_seconds,
+        )
+
+    def _retry_delay(
+        self,
+        method: str,
+        attempt: int,
+        response: httpx.Response | None,
+        error: httpx.TransportError | None = None,
+    ) -> float | None:
+        if attempt >= self._config.max_retries:
+            return None
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return None
+        if method.upper() not in IDEMPOTENT_METHODS:
+            if error is not None and not isinstance(error, UNSENT_ERRORS):
+                return None
+            if response is not None and (
+                response.status_code not in UNPROCESSED_STATUSES or _server_retry_delay(response) is None
+            ):
+                return None
+
+        backoff = min(self._config.max_backoff_seconds, self._config.backoff_seconds * 2**attempt)
+        delay = random.uniform(backoff / 2, backoff)
+        if response is not None:
+            server_delay = _server_retry_delay(response)
+            if server_delay is not None:
+                if server_delay > self._config.max_backoff_seconds:
+                    return None
+                delay = server_delay
+        return delay
+
+
+def _host_key(url: str) -> str:
+    parsed = httpx.URL(url)
+    return f"{parsed.scheme}://{parsed.netloc.decode('ascii')}"
+
+
+def _record_request(url: str, started: float, status: str) -> None:
+    host = httpx.URL(url).host
+    HTTP_REQUESTS.inc(host=host, status=status)
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, host=host)
+
+
+def _server_retry_delay(response: httpx.Response) -> float | None:
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    ratelimit_reset = response.headers.get("Ratelimit-Reset")
+    if response.status_code == 429 and ratelimit_reset and ratelimit_reset.isdigit():
+        return max(0.0, int(ratelimit_reset) - time.time())
+    return None
@@ -0,0 +1,140 @@
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Iterator
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    @abstractmethod
+    def _samples(self) -> Iterator[str]: ...
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.help_text}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(f"{line}\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple[str, ...], float] = {} if labels else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...] = ()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple[str, ...], float] = {} if labels else {(): 0.0}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def _samples(self) -> Iterator[str]:
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help_text, labels)
+        self._buckets = buckets
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        if not labels:
+            self._values[()] = ([0] * (len(buckets) + 1), [0.0])
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts, total = self._values.setdefault(key, ([0] * (len(self._buckets) + 1), [0.0]))
+        for index, bound in enumerate(self._buckets):
+            if value <= bound:
+                counts[index] += 1
+        counts[-1] += 1
+        total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> Iterator[str]:
+        for key, (counts, total) in sorted(self._values.items()):
+            for bound, count in zip((*self._buckets, "+Inf"), counts):
+                le = bound if isinstance(bound, str) else _number(bound)
+                yield f"{self.name}_bucket{_labels((*self.label_names, 'le'), (*key, le))} {count}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_number(total[0])}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {counts[-1]}"
+
+
+REGISTRY: list[_Metric] = []
+
+POLL_CYCLE_SECONDS = Histogram("thaddeus_poll_cycle_seconds", "Duration of a poll cycle.")
+POLL_RESULTS = Counter("thaddeus_poll_results_total", "Subscription check outcomes.", ("platform", "result"))
+HTTP_REQUESTS = Counter("thaddeus_http_requests_total", "Upstream HTTP requests by status.", ("host", "status"))
+HTTP_REQUEST_SECONDS = Histogram("thaddeus_http_request_seconds", "Upstream HTTP request latency.", ("host",))
+TWITCH_TOKEN_REFRESHES = Counter("thaddeus_twitch_token_refreshes_total", "Twitch app access token fetches.")
+YOUTUBE_QUOTA_UNITS = Counter(
+    "thaddeus_youtube_quota_units_total", "Estimated YouTube Data API quota units used.", ("resource",)
+)
+TELEGRAM_SEND_SECONDS = Histogram("thaddeus_telegram_send_seconds", "Telegram Bot API send latency.", ("method",))
+TELEGRAM_SENDS = Counter("thaddeus_telegram_sends_total", "Telegram sends by outcome.", ("method", "result"))
+TELEGRAM_FLOOD_WAITS = Counter("thaddeus_telegram_flood_waits_total", "Telegram RetryAfter responses.")
+TELEGRAM_QUEUE_PENDING = Gauge("thaddeus_telegram_queue_pending", "Messages waiting in the send queue.")
+STATE_WRITE_SECONDS = Histogram("thaddeus_state_write_seconds", "State file write duration.", ("backend",))
+RESOURCE_CACHE_REQUESTS = Counter(
+    "thaddeus_resource_cache_requests_total", "Dynamic command resource lookups.", ("result",)
+)
+
+
+def render() -> str:
+    return "".join(metric.render() for metric in REGISTRY)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
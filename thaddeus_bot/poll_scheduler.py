@@ -0,0 +1,118 @@
+import heapq
+import itertools
+from datetime import datetime, timedelta
+from typing import Callable, Hashable, Iterable
+from zoneinfo import ZoneInfo
+
+from .app_config import ScheduleConfig
+
+
+class PollScheduler:
+    def __init__(self, config: ScheduleConfig, base_interval: float):
+        self._config = config
+        self._base_interval = base_interval
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._due: dict[Hashable, float] = {}
+        self._intervals: dict[Hashable, float] = {}
+        self._sequence = itertools.count()
+        self._tokens = float(config.requests_per_minute)
+        self._refilled_at: float | None = None
+
+    def sync(self, keys: Iterable[Hashable], now: float) -> None:
+        wanted = set(keys)
+        for key in list(self._due):
+            if key not in wanted:
+                del self._due[key]
+                self._intervals.pop(key, None)
+        for key in wanted:
+            if key not in self._due:
+                self._push(key, now)
+
+    def pop_due(self, now: float, cost: Callable[[Hashable], float]) -> list[Hashable]:
+        self._refill(now)
+        due: list[Hashable] = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, _, key = self._heap[0]
+            if self._due.get(key) != due_at:
+                heapq.heappop(self._heap)
+                continue
+            if self._config.requests_per_minute:
+                key_cost = cost(key)
+                if key_cost > self._tokens:
+                    break
+                self._tokens -= key_cost
+            heapq.heappop(self._heap)
+            del self._due[key]
+            due.append(key)
+        return due
+
+    def seconds_until_due(self, now: float) -> float:
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return self._config.max_interval_seconds
+
+        wait = self._heap[0][0] - now
+        if wait <= 0 and self._config.requests_per_minute:
+            wait = 60.0 / self._config.requests_per_minute
+        return max(0.0, wait)
+
+    def record(
+        self,
+        key: Hashable,
+        now: float,
+        *,
+        live: bool,
+        error: bool,
+        hot_times: Iterable[float],
+        idle_interval: float | None = None,
+    ) -> None:
+        window = self._config.hot_window_seconds
+        hot = False
+        next_hot: float | None = None
+        for hot_time in hot_times:
+            if hot_time - window <= now <= hot_time + window:
+                hot = True
+            elif hot_time - window > now:
+                next_hot = min(next_hot, hot_time - window) if next_hot is not None else hot_time - window
+
+        previous = self._intervals.get(key, self._base_interval)
+        if hot:
+            interval = self._config.min_interval_seconds
+        elif live:
+            interval = self._base_interval
+        elif error:
+            interval = previous
+        elif idle_interval is not None:
+            interval = idle_interval
+        else:
+            backoff = max(self._base_interval, previous * self._config.backoff_factor)
+            interval = min(self._config.max_interval_seconds, backoff)
+        interval = max(self._config.min_interval_seconds, interval)
+        self._intervals[key] = interval
+
+        due_at = now + interval
+        if next_hot is not None:
+            due_at = min(due_at, next_hot)
+        self._push(key, due_at)
+
+    def _push(self, key: Hashable, due_at: float) -> None:
+        self._due[key] = due_at
+        heapq.heappush(self._heap, (due_at, next(self._sequence), key))
+
+    def _refill(self, now: float) -> None:
+        rate = self._config.requests_per_minute
+        if not rate:
+            return
+        if self._refilled_at is not None:
+            self._tokens = min(float(rate), self._tokens + (now - self._refilled_at) * rate / 60.0)
+        self._refilled_at = now
+
+
+def start_time_occurrences(start_time: tuple[int, int, int], timezone: str, now: float) -> list[float]:
+    weekday, hour, minute = start_time
+    local_now = datetime.fromtimestamp(now, ZoneInfo(timezone))
+    this_week = local_now.replace(hour=hour, minute=minute, second=0, microsecond=0) + timedelta(
+        days=weekday - local_now.weekday()
+    )
+    return [(this_week + timedelta(days=offset)).timestamp() for offset in (-7, 0, 7)]
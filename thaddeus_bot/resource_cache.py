@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .app_config import ResourceCacheConfig, _normalize_resource_path, fetch_remote_resource
+from .atomic_file import write_atomic
+from .http_transport import HttpTransport
+from .metrics import RESOURCE_CACHE_REQUESTS
+
+
+LOG = logging.getLogger("resource-cache")
+INDEX_FIELDS = frozenset({"hash", "size", "fetched_at", "used_at"})
+# Cache hits only touch used_at, so they are written out at most this often.
+INDEX_SAVE_INTERVAL_SECONDS = 60.0
+
+
+@dataclass
+class CachedResource:
+    path: str
+    filename: str
+    content: bytes
+    digest: str
+
+
+class ResourceCache:
+    def __init__(self, config: ResourceCacheConfig, transport: HttpTransport):
+        self._config = config
+        self._transport = transport
+        self._objects_dir = config.directory / "objects"
+        self._index_file = config.directory / "index.json"
+        self._index = self._load_index()
+        self._index_saved_at = 0.0
+        self._revalidating: dict[str, asyncio.Task] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    async def get(self, resource_path: str) -> CachedResource:
+        path = _normalize_resource_path(resource_path)
+        entry = self._index.get(path)
+        content = self._read_body(entry) if entry else None
+
+        if entry is None or content is None:
+            RESOURCE_CACHE_REQUESTS.inc(result="miss")
+            return await self._revalidate(path)
+
+        cached = CachedResource(path, _filename(path), content, entry["hash"])
+        now = time.time()
+        age = now - entry["fetched_at"]
+        entry["used_at"] = now
+        if now - self._index_saved_at >= INDEX_SAVE_INTERVAL_SECONDS:
+            self._save_index()
+        if age < self._config.ttl_seconds:
+            RESOURCE_CACHE_REQUESTS.inc(result="hit")
+            return cached
+
+        if age < self._config.ttl_seconds + self._config.stale_seconds:
+            RESOURCE_CACHE_REQUESTS.inc(result="stale")
+            if path not in self._revalidating:
+                task = asyncio.create_task(self._revalidate_in_background(path))
+                self._revalidating[path] = task
+                task.add_done_callback(lambda _: self._revalidating.pop(path, None))
+            return cached
+
+        RESOURCE_CACHE_REQUESTS.inc(result="expired")
+        try:
+            return await self._revalidate(path)
+        except Exception:
+            LOG.exception("Failed to revalidate resource %s, serving cached copy", path)
+            return cached
+
+    async def _revalidate_in_background(self, path: str) -> None:
+        try:
+            await self._revalidate(path)
+        except Exception:
+            LOG.exception("Background revalidation failed for resource %s", path)
+
+    async def _revalidate(self, path: str) -> CachedResource:
+        # Concurrent misses for the same path share one download.
+        future = self._inflight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(path))
+            self._inflight[path] = future
+            future.add_done_callback(lambda _: self._inflight.pop(path, None))
+        return await asyncio.shield(future)
+
+    async def _fetch(self, path: str) -> CachedResource:
+        entry = self._index.get(path)
+        content = self._read_body(entry) if entry else None
+        headers: dict[str, str] = {}
+        if entry is not None and content is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = await fetch_remote_resource(path, self._transport, headers=headers)
+        now = time.time()
+        if response.status_code == 304 and entry is not None and content is not None:
+            entry["fetched_at"] = now
+            entry["used_at"] = now
+            self._save_index()
+            return CachedResource(path, _filename(path), content, entry["hash"])
+
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        body_file = self._objects_dir / digest
+        if not body_file.exists():
+            self._objects_dir.mkdir(parents=True, exist_ok=True)
+            write_atomic(body_file, content)
+
+        self._index[path] = {
+            "hash": digest,
+            "size": len(content),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": now,
+            "used_at": now,
+        }
+        self._evict()
+        self._save_index()
+        return CachedResource(path, _filename(path), content, digest)
+
+    def _read_body(self, entry: dict[str, Any]) -> bytes | None:
+        try:
+            return (self._objects_dir / entry["hash"]).read_bytes()
+        except OSError:
+            return None
+
+    def _evict(self) -> None:
+        sizes = {entry["hash"]: entry["size"] for entry in self._index.values()}
+        total = sum(sizes.values())
+        for path, entry in sorted(self._index.items(), key=lambda item: item[1]["used_at"]):
+            if total <= self._config.max_bytes:
+                break
+            del self._index[path]
+            if any(other["hash"] == entry["hash"] for other in self._index.values()):
+                continue
+            total -= sizes[entry["hash"]]
+            (self._objects_dir / entry["hash"]).unlink(missing_ok=True)
+            LOG.info("Evicted cached resource %s (%s bytes)", path, entry["size"])
+
+    def _load_index(self) -> dict[str, dict[str, Any]]:
+        if not self._index_file.exists():
+            return {}
+
+        try:
+            payload = json.loads(self._index_file.read_text(encoding="utf-8"))
+            if isinstance(payload, dict):
+                return {
+                    path: entry
+                    for path, entry in payload.items()
+                    if isinstance(entry, dict) and INDEX_FIELDS <= entry.keys()
+                }
+        except Exception:
+            LOG.exception("Failed to load resource cache index %s", self._index_file)
+
+        return {}
+
+    def _save_index(self) -> None:
+        self._index_saved_at = time.time()
+        try:
+            self._config.directory.mkdir(parents=True, exist_ok=True)
+            write_atomic(self._index_file, json.dumps(self._index).encode("utf-8"))
+        except Exception:
+            LOG.exception("Failed to save resource cache index %s", self._index_file)
+
+
+class FileIdStore:
+    def __init__(self, path: Path):
+        self._path = path
+        self._entries = self._load()
+
+    def get(self, resource: CachedResource) -> str | None:
+        entry = self._entries.get(resource.path)
+        if entry is None or entry["hash"] != resource.digest:
+            return None
+        return entry["file_id"]
+
+    def set(self, resource: CachedResource, file_id: str) -> None:
+        self._entries[resource.path] = {"hash": resource.digest, "file_id": file_id}
+        self._save()
+
+    def discard(self, resource: CachedResource) -> None:
+        if self._entries.pop(resource.path, None) is not None:
+            self._save()
+
+    def _load(self) -> dict[str, dict[str, str]]:
+        if not self._path.exists():
+            return {}
+
+        try:
+            payload = json.loads(self._path.read_text(encoding="utf-8"))
+            if isinstance(payload, dict):
+                return {
+                    path: entry
+                    for path, entry in payload.items()
+                    if isinstance(entry, dict) and entry.get("hash") and entry.get("file_id")
+                }
+        except Exception:
+            LOG.exception("Failed to load Telegram file id store %s", self._path)
+
+        return {}
+
+    def _save(self) -> None:
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(self._path, json.dumps(self._entries).encode("utf-8"))
+        except Exception:
+            LOG.exception("Failed to save Telegram file id store %s", self._path)
+
+
+def _filename(path: str) -> str:
+    return Path(path).name or "resource.bin"
@@ -0,0 +1,282 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any
+
+from telegram import Bot
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+
+from .app_config import SendQueueConfig
+from .atomic_file import write_atomic
+from .metrics import TELEGRAM_FLOOD_WAITS, TELEGRAM_QUEUE_PENDING, TELEGRAM_SEND_SECONDS, TELEGRAM_SENDS
+from .sharding import SharedOutbox
+
+
+LOG = logging.getLogger("send-queue")
+MAX_RETRY_DELAY_SECONDS = 60.0
+OUTBOX_POLL_SECONDS = 1.0
+
+
+@dataclass
+class _Job:
+    method: str
+    kwargs: dict[str, Any]
+    persist: bool
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    future: asyncio.Future | None = None
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, capacity: float, now: float):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated_at = now
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float) -> float:
+        wait = max(0.0, self.blocked_until - now)
+        if self._rate <= 0:
+            return wait
+        self._refill(now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self._rate)
+        return wait
+
+    def take(self, now: float, cost: int = 1) -> None:
+        if self._rate <= 0:
+            return
+        self._refill(now)
+        self._tokens -= cost
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+
+class SendQueue:
+    def __init__(self, config: SendQueueConfig, bot: Bot, outbox: SharedOutbox | None = None):
+        self._config = config
+        self._bot = bot
+        self._outbox = outbox
+        self._queues: dict[str, deque[_Job]] = {}
+        self._chat_buckets: dict[str, _TokenBucket] = {}
+        self._global_bucket = _TokenBucket(
+            config.global_messages_per_second, max(1.0, config.global_messages_per_second), time.monotonic()
+        )
+        self._wakeup = asyncio.Event()
+        self._drained = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._outbox_task: asyncio.Task | None = None
+        self._dirty = False
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    async def start(self) -> None:
+        for job in self._load():
+            self._queue(job)
+        if self.pending:
+            LOG.info("Resuming %s pending Telegram sends", self.pending)
+        self._worker = asyncio.create_task(self._run())
+        if self._outbox:
+            self._outbox_task = asyncio.create_task(self._import_outbox())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        if self._worker is None:
+            return
+
+        if self._outbox_task:
+            self._outbox_task.cancel()
+            self._outbox_task = None
+        if not await self.drain(timeout):
+            LOG.warning("Stopping with %s Telegram sends still pending", self.pending)
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        self.flush()
+
+        for queue in self._queues.values():
+            for job in queue:
+                if job.future is not None and not job.future.done():
+                    job.future.cancel()
+
+    async def drain(self, timeout: float | None = None) -> bool:
+        if not self.pending:
+            return True
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def enqueue(self, method: str, **kwargs: Any) -> None:
+        self._queue(_Job(method, kwargs, persist=self._config.file is not None))
+        self._dirty = True
+
+    async def send(self, method: str, **kwargs: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._queue(_Job(method, kwargs, persist=False, future=future))
+        return await future
+
+    def flush(self) -> None:
+        if not self._dirty or self._config.file is None:
+            return
+
+        jobs = [
+            {"id": job.id, "method": job.method, "kwargs": job.kwargs, "attempts": job.attempts}
+            for queue in self._queues.values()
+            for job in queue
+            if job.persist
+        ]
+        try:
+            write_atomic(self._config.file, json.dumps(jobs, indent=2).encode("utf-8"))
+            self._dirty = False
+        except Exception:
+            LOG.exception("Failed to save send queue to %s", self._config.file)
+
+    def _load(self) -> list[_Job]:
+        if self._config.file is None or not self._config.file.exists():
+            return []
+
+        try:
+            payload = json.loads(self._config.file.read_text(encoding="utf-8"))
+            return [
+                _Job(item["method"], item["kwargs"], persist=True, id=item["id"], attempts=item.get("attempts", 0))
+                for item in payload
+            ]
+        except Exception:
+            LOG.exception("Failed to load send queue %s", self._config.file)
+            return []
+
+    async def _import_outbox(self) -> None:
+        while True:
+            rows = []
+            try:
+                rows = self._outbox.take()
+                queued = {job.id for queue in self._queues.values() for job in queue}
+                for job_id, method, kwargs in rows:
+                    if job_id not in queued:
+                        self._queue(_Job(method, kwargs, persist=self._config.file is not None, id=job_id))
+                if rows:
+                    self._dirty = True
+                    self.flush()
+                    self._outbox.remove([job_id for job_id, _, _ in rows])
+            except Exception:
+                LOG.exception("Failed to import messages from the shared outbox")
+                rows = []
+            await asyncio.sleep(0 if rows else OUTBOX_POLL_SECONDS)
+
+    def _queue(self, job: _Job) -> None:
+        self._queues.setdefault(str(job.kwargs.get("chat_id")), deque()).append(job)
+        TELEGRAM_QUEUE_PENDING.set(self.pending)
+        self._drained.clear()
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            self.flush()
+            chat_id, wait = self._next_chat()
+            if chat_id is not None:
+                await self._deliver(chat_id)
+                continue
+
+            if not self._queues:
+                self._drained.set()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _next_chat(self) -> tuple[str | None, float | None]:
+        now = time.monotonic()
+        global_wait = self._global_bucket.wait_time(now)
+        wait: float | None = None
+        for chat_id in list(self._queues):
+            if not self._queues[chat_id]:
+                del self._queues[chat_id]
+                continue
+            chat_wait = max(global_wait, self._chat_bucket(chat_id).wait_time(now))
+            if chat_wait <= 0:
+                self._queues[chat_id] = self._queues.pop(chat_id)
+                return chat_id, None
+            wait = chat_wait if wait is None else min(wait, chat_wait)
+        return None, wait
+
+    def _chat_bucket(self, chat_id: str) -> _TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = _TokenBucket(
+                self._config.chat_messages_per_minute / 60.0, self._config.chat_burst, time.monotonic()
+            )
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _deliver(self, chat_id: str) -> None:
+        job = self._queues[chat_id][0]
+        bucket = self._chat_bucket(chat_id)
+        now = time.monotonic()
+        # Telegram counts every item of a media group against the flood limits.
+        cost = len(job.kwargs.get("media") or ()) or 1
+        self._global_bucket.take(now, cost)
+        bucket.take(now, cost)
+
+        try:
+            with TELEGRAM_SEND_SECONDS.time(method=job.method):
+                result = await getattr(self._bot, job.method)(**job.kwargs)
+        except RetryAfter as exc:
+            TELEGRAM_FLOOD_WAITS.inc()
+            delay = _seconds(exc.retry_after)
+            LOG.warning("Telegram flood limit hit for chat %s, retrying in %.0fs", chat_id, delay)
+            bucket.blocked_until = time.monotonic() + delay
+            return
+        except (BadRequest, Forbidden) as exc:
+            self._finish(chat_id, job, error=exc)
+            return
+        except NetworkError as exc:
+            job.attempts += 1
+            if job.attempts < self._config.max_attempts:
+                delay = min(MAX_RETRY_DELAY_SECONDS, 2.0**job.attempts)
+                LOG.warning("Telegram %s to chat %s failed (%s), retrying in %.0fs", job.method, chat_id, exc, delay)
+                bucket.blocked_until = time.monotonic() + delay
+                self._dirty = self._dirty or job.persist
+                TELEGRAM_SENDS.inc(method=job.method, result="retry")
+                return
+            self._finish(chat_id, job, error=exc)
+            return
+        except Exception as exc:
+            self._finish(chat_id, job, error=exc)
+            return
+
+        self._finish(chat_id, job, result=result)
+
+    def _finish(self, chat_id: str, job: _Job, result: Any = None, error: Exception | None = None) -> None:
+        self._queues[chat_id].popleft()
+        self._dirty = self._dirty or job.persist
+        TELEGRAM_SENDS.inc(method=job.method, result="failed" if error is not None else "sent")
+        TELEGRAM_QUEUE_PENDING.set(self.pending)
+        if job.future is not None:
+            if not job.future.done():
+                if error is not None:
+                    job.future.set_exception(error)
+                else:
+                    job.future.set_result(result)
+        elif error is not None:
+            LOG.error("Dropping Telegram %s to chat %s", job.method, chat_id, exc_info=error)
+
+
+def _seconds(value: float | timedelta) -> float:
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
@@ -0,0 +1,181 @@
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from .app_config import ShardingConfig
+
+
+LOG = logging.getLogger("sharding")
+VIRTUAL_NODES = 64
+
+
+def worker_id() -> str:
+    return os.environ.get("THADDEUS_WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+def shard_of(key: tuple[str, str], shards: int) -> int:
+    return _hash(f"{key[0]}:{key[1]}") % shards
+
+
+def assign_shards(workers: list[str], shards: int) -> dict[int, str]:
+    ring = sorted((_hash(f"{worker}#{node}"), worker) for worker in workers for node in range(VIRTUAL_NODES))
+    if not ring:
+        return {}
+    points = [point for point, _ in ring]
+    return {
+        shard: ring[bisect.bisect(points, _hash(f"shard:{shard}")) % len(ring)][1] for shard in range(shards)
+    }
+
+
+class ShardCoordinator:
+    def __init__(self, config: ShardingConfig, on_change: Callable[[], None]):
+        self._config = config
+        self._on_change = on_change
+        self.worker_id = worker_id()
+        self.owned: frozenset[int] = frozenset()
+        self._connection = _connect(config.database)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS shard_workers (worker_id TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS shard_leases ("
+            "shard INTEGER PRIMARY KEY, worker_id TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def owns(self, key: tuple[str, str]) -> bool:
+        return shard_of(key, self._config.shards) in self.owned
+
+    async def run(self) -> None:
+        while True:
+            try:
+                self.heartbeat()
+            except Exception:
+                LOG.exception("Shard heartbeat failed")
+            await asyncio.sleep(self._config.heartbeat_seconds)
+
+    def heartbeat(self) -> None:
+        now = time.time()
+        expires_at = now + self._config.lease_seconds
+        with _transaction(self._connection):
+            self._connection.execute(
+                "INSERT INTO shard_workers (worker_id, expires_at) VALUES (?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET expires_at = excluded.expires_at",
+                (self.worker_id, expires_at),
+            )
+            self._connection.execute("DELETE FROM shard_workers WHERE expires_at <= ?", (now,))
+            workers = [row[0] for row in self._connection.execute("SELECT worker_id FROM shard_workers")]
+            wanted = [
+                shard for shard, owner in assign_shards(workers, self._config.shards).items() if owner == self.worker_id
+            ]
+
+            self._connection.execute(
+                f"DELETE FROM shard_leases WHERE worker_id = ? AND shard NOT IN ({','.join('?' * len(wanted))})",
+                (self.worker_id, *wanted),
+            )
+            self._connection.executemany(
+                "INSERT INTO shard_leases (shard, worker_id, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(shard) DO UPDATE SET worker_id = excluded.worker_id, expires_at = excluded.expires_at "
+                "WHERE shard_leases.worker_id = excluded.worker_id OR shard_leases.expires_at <= ?",
+                [(shard, self.worker_id, expires_at, now) for shard in wanted],
+            )
+            owned = frozenset(
+                row[0]
+                for row in self._connection.execute(
+                    "SELECT shard FROM shard_leases WHERE worker_id = ?", (self.worker_id,)
+                )
+            )
+
+        if owned != self.owned:
+            LOG.info(
+                "Worker %s now owns %s/%s shards (+%s -%s) with %s live workers",
+                self.worker_id,
+                len(owned),
+                self._config.shards,
+                len(owned - self.owned),
+                len(self.owned - owned),
+                len(workers),
+            )
+            self.owned = owned
+            self._on_change()
+
+    def close(self) -> None:
+        try:
+            with _transaction(self._connection):
+                self._connection.execute("DELETE FROM shard_leases WHERE worker_id = ?", (self.worker_id,))
+                self._connection.execute("DELETE FROM shard_workers WHERE worker_id = ?", (self.worker_id,))
+        except Exception:
+            LOG.exception("Failed to release shard leases for %s", self.worker_id)
+        self.owned = frozenset()
+        self._connection.close()
+
+
+class SharedOutbox:
+    def __init__(self, path: Path):
+        self._connection = _connect(path)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS send_outbox ("
+            "id TEXT PRIMARY KEY, method TEXT NOT NULL, kwargs TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._pending: list[tuple[str, str, str, float]] = []
+
+    def enqueue(self, method: str, **kwargs: Any) -> None:
+        self._pending.append((uuid.uuid4().hex, method, json.dumps(kwargs), time.time()))
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+
+        try:
+            with _transaction(self._connection):
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO send_outbox (id, method, kwargs, created_at) VALUES (?, ?, ?, ?)",
+                    self._pending,
+                )
+            self._pending.clear()
+        except Exception:
+            LOG.exception("Failed to write %s messages to the shared outbox", len(self._pending))
+
+    def take(self, limit: int = 100) -> list[tuple[str, str, dict[str, Any]]]:
+        rows = self._connection.execute(
+            "SELECT id, method, kwargs FROM send_outbox ORDER BY created_at LIMIT ?", (limit,)
+        ).fetchall()
+        return [(job_id, method, json.loads(kwargs)) for job_id, method, kwargs in rows]
+
+    def remove(self, job_ids: list[str]) -> None:
+        with _transaction(self._connection):
+            self._connection.executemany("DELETE FROM send_outbox WHERE id = ?", [(job_id,) for job_id in job_ids])
+
+    def close(self) -> None:
+        self.flush()
+        self._connection.close()
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+@contextmanager
+def _transaction(connection: sqlite3.Connection) -> Iterator[None]:
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
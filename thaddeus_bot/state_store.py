@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from .atomic_file import write_atomic
+from .metrics import STATE_WRITE_SECONDS
+
+
+LOG = logging.getLogger("state-store")
+JOURNAL_COMPACT_FACTOR = 4
+
+
+@dataclass
+class SubscriptionState:
+    live: bool = False
+    stream_id: str | None = None
+    changed_at: float | None = None
+
+
+class StateStore(ABC):
+    backend = ""
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._states = self._load()
+        self._dirty: set[str] = set()
+
+    def get(self, key: str) -> SubscriptionState:
+        return self._states.get(key) or SubscriptionState()
+
+    def set(self, key: str, state: SubscriptionState) -> None:
+        self._states[key] = state
+        self._dirty.add(key)
+
+    def flush(self) -> None:
+        if not self._dirty:
+            return
+
+        dirty = {key: self._states[key] for key in sorted(self._dirty)}
+        try:
+            with STATE_WRITE_SECONDS.time(backend=self.backend):
+                self._write(dirty)
+            self._dirty.clear()
+        except Exception:
+            LOG.exception("Failed to save state to %s", self._path)
+
+    def close(self) -> None:
+        self.flush()
+
+    def reload(self) -> None:
+        self._states = {**self._load(), **{key: self._states[key] for key in self._dirty}}
+
+    @abstractmethod
+    def _load(self) -> dict[str, SubscriptionState]: ...
+
+    @abstractmethod
+    def _write(self, dirty: dict[str, SubscriptionState]) -> None: ...
+
+
+class JsonStateStore(StateStore):
+    backend = "json"
+
+    def _load(self) -> dict[str, SubscriptionState]:
+        if not self._path.exists():
+            return {}
+
+        try:
+            payload = json.loads(self._path.read_text(encoding="utf-8"))
+            if isinstance(payload, dict):
+                return {key: _parse_state(value) for key, value in payload.items()}
+        except Exception:
+            LOG.exception("Failed to load state file %s", self._path)
+
+        return {}
+
+    def _write(self, dirty: dict[str, SubscriptionState]) -> None:
+        payload = {key: asdict(state) for key, state in self._states.items()}
+        write_atomic(self._path, json.dumps(payload, indent=2).encode("utf-8"))
+
+
+class JournalStateStore(StateStore):
+    backend = "journal"
+
+    def _load(self) -> dict[str, SubscriptionState]:
+        self._journal_lines = 0
+        if not self._path.exists():
+            return {}
+
+        states: dict[str, SubscriptionState] = {}
+        count = 0
+        with open(self._path, encoding="utf-8") as handle:
+            for count, line in enumerate(handle, start=1):
+                try:
+                    record = json.loads(line)
+                    states[record["key"]] = _parse_state(record["state"])
+                except Exception:
+                    LOG.warning("Skipping unreadable journal line %s in %s", count, self._path)
+        self._journal_lines = count
+        return states
+
+    def _write(self, dirty: dict[str, SubscriptionState]) -> None:
+        if self._journal_lines + len(dirty) > JOURNAL_COMPACT_FACTOR * max(len(self._states), 1):
+            self._compact()
+            return
+
+        with open(self._path, "a", encoding="utf-8") as handle:
+            for key, state in dirty.items():
+                handle.write(json.dumps({"key": key, "state": asdict(state)}) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        self._journal_lines += len(dirty)
+
+    def _compact(self) -> None:
+        lines = [json.dumps({"key": key, "state": asdict(state)}) + "\n" for key, state in self._states.items()]
+        write_atomic(self._path, "".join(lines).encode("utf-8"))
+        self._journal_lines = len(lines)
+
+
+class SqliteStateStore(StateStore):
+    backend = "sqlite"
+
+    def __init__(self, path: Path):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS subscription_state ("
+            "key TEXT PRIMARY KEY, live INTEGER NOT NULL, stream_id TEXT, changed_at REAL)"
+        )
+        self._connection.commit()
+        super().__init__(path)
+
+    def _load(self) -> dict[str, SubscriptionState]:
+        rows = self._connection.execute("SELECT key, live, stream_id, changed_at FROM subscription_state")
+        return {
+            key: SubscriptionState(live=bool(live), stream_id=stream_id, changed_at=changed_at)
+            for key, live, stream_id, changed_at in rows
+        }
+
+    def _write(self, dirty: dict[str, SubscriptionState]) -> None:
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO subscription_state (key, live, stream_id, changed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET live = excluded.live, stream_id = excluded.stream_id, "
+                "changed_at = excluded.changed_at",
+                [(key, int(state.live), state.stream_id, state.changed_at) for key, state in dirty.items()],
+            )
+
+    def close(self) -> None:
+        super().close()
+        self._connection.close()
+
+
+STATE_BACKENDS: dict[str, type[StateStore]] = {
+    "json": JsonStateStore,
+    "journal": JournalStateStore,
+    "sqlite": SqliteStateStore,
+}
+
+
+def create_state_store(backend: str, path: Path) -> StateStore:
+    store_class = STATE_BACKENDS.get(backend)
+    if store_class is None:
+        raise ValueError(f"Unsupported state backend: {backend}")
+    return store_class(path)
+
+
+def _parse_state(value: Any) -> SubscriptionState:
+    if isinstance(value, dict):
+        return SubscriptionState(
+            live=bool(value.get("live", False)),
+            stream_id=value.get("stream_id"),
+            changed_at=value.get("changed_at"),
+        )
+    return SubscriptionState(live=bool(value))
@@ -1,92 +1,431 @@
-import requests
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
 
 from .app_config import TwitchConfig, YouTubeConfig
+from .atomic_file import write_atomic
+from .http_transport import HttpTransport
+from .metrics import TWITCH_TOKEN_REFRESHES, YOUTUBE_QUOTA_UNITS
+
+
+LOG = logging.getLogger("stream-clients")
+HELIX_MAX_LOGINS = 100
+YOUTUBE_MAX_IDS = 50
+YOUTUBE_SEEN_LIMIT = 50
+YOUTUBE_QUOTA_COSTS = {"channels": 1, "playlistItems": 1, "videos": 1, "search": 100}
+TWITCH_TOKEN_REFRESH_MARGIN_SECONDS = 600
+TWITCH_TOKEN_VALIDATE_SECONDS = 3600
+TWITCH_TOKEN_RETRY_SECONDS = 60
+
+
+@dataclass(frozen=True)
+class LiveResult:
+    is_live: bool
+    url: str
+    title: str | None = None
+    stream_id: str | None = None
+    scheduled_start: float | None = None
 
 
 class TwitchClient:
-    def __init__(self, config: TwitchConfig):
+    def __init__(self, config: TwitchConfig, transport: HttpTransport):
         self._config = config
-        self._access_token: str | None = None
+        self._transport = transport
+        self._access_token, self._expires_at = self._load_token()
+        self._token_lock = asyncio.Lock()
 
-    def _ensure_token(self) -> str:
-        if self._access_token:
+    async def maintain_token(self) -> None:
+        while True:
+            try:
+                if self._token_valid():
+                    await self._validate_token()
+                await self._ensure_token()
+                delay = min(
+                    TWITCH_TOKEN_VALIDATE_SECONDS, self._expires_at - TWITCH_TOKEN_REFRESH_MARGIN_SECONDS - time.time()
+                )
+            except Exception:
+                LOG.exception("Failed to refresh Twitch app access token")
+                delay = TWITCH_TOKEN_RETRY_SECONDS
+            await asyncio.sleep(max(TWITCH_TOKEN_RETRY_SECONDS, delay))
+
+    def _token_valid(self) -> bool:
+        return self._access_token is not None and time.time() < self._expires_at - TWITCH_TOKEN_REFRESH_MARGIN_SECONDS
+
+    async def _ensure_token(self) -> str:
+        if self._token_valid():
             return self._access_token
 
-        response = requests.post(
-            "https://id.twitch.tv/oauth2/token",
-            params={
-                "client_id": self._config.client_id,
-                "client_secret": self._config.client_secret,
-                "grant_type": "client_credentials",
-            },
-            timeout=20,
+        async with self._token_lock:
+            if self._token_valid():
+                return self._access_token
+
+            response = await self._transport.request(
+                "POST",
+                f"{self._config.auth_url}/token",
+                params={
+                    "client_id": self._config.client_id,
+                    "client_secret": self._config.client_secret,
+                    "grant_type": "client_credentials",
+                },
+            )
+            response.raise_for_status()
+            payload = response.json()
+            self._access_token = payload["access_token"]
+            self._expires_at = time.time() + float(payload.get("expires_in", TWITCH_TOKEN_VALIDATE_SECONDS))
+            TWITCH_TOKEN_REFRESHES.inc()
+            self._save_token()
+            return self._access_token
+
+    async def _validate_token(self) -> None:
+        token = self._access_token
+        response = await self._transport.request(
+            "GET", f"{self._config.auth_url}/validate", headers={"Authorization": f"OAuth {token}"}
         )
+        if response.status_code == 401:
+            LOG.warning("Twitch app access token is no longer valid, requesting a new one")
+            self._invalidate_token(token)
+            return
         response.raise_for_status()
-        payload = response.json()
-        self._access_token = payload["access_token"]
-        return self._access_token
-
-    def check_live(self, channel: str) -> tuple[bool, str, str | None]:
-        token = self._ensure_token()
-        response = requests.get(
-            "https://api.twitch.tv/helix/streams",
-            params={"user_login": channel},
-            headers={
-                "Client-Id": self._config.client_id,
-                "Authorization": f"Bearer {token}",
+        if self._access_token == token:
+            self._expires_at = time.time() + float(response.json().get("expires_in", 0))
+
+    def _invalidate_token(self, token: str | None) -> None:
+        if self._access_token == token:
+            self._access_token = None
+            self._expires_at = 0.0
+
+    def _load_token(self) -> tuple[str | None, float]:
+        path = self._config.token_file
+        if path is None or not path.exists():
+            return None, 0.0
+
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            if payload.get("client_id") == self._config.client_id and payload.get("expires_at", 0) > time.time():
+                return str(payload["access_token"]), float(payload["expires_at"])
+        except Exception:
+            LOG.exception("Failed to load Twitch token file %s", path)
+        return None, 0.0
+
+    def _save_token(self) -> None:
+        if self._config.token_file is None:
+            return
+
+        payload = {
+            "client_id": self._config.client_id,
+            "access_token": self._access_token,
+            "expires_at": self._expires_at,
+        }
+        try:
+            write_atomic(self._config.token_file, json.dumps(payload).encode("utf-8"), mode=0o600)
+        except Exception:
+            LOG.exception("Failed to save Twitch token file %s", self._config.token_file)
+
+    async def check_live(self, channel: str) -> LiveResult:
+        return (await self.check_live_many([channel]))[channel]
+
+    async def check_live_many(self, channels: Iterable[str]) -> dict[str, LiveResult]:
+        requested = list(dict.fromkeys(channels))
+        logins = list(dict.fromkeys(channel.strip().lower() for channel in requested))
+        streams: dict[str, dict[str, Any]] = {}
+
+        for start in range(0, len(logins), HELIX_MAX_LOGINS):
+            chunk = logins[start : start + HELIX_MAX_LOGINS]
+            for stream in await self._fetch_streams(chunk):
+                login = str(stream.get("user_login", "")).lower()
+                if login and login not in streams:
+                    streams[login] = stream
+
+        results: dict[str, LiveResult] = {}
+        for channel in requested:
+            url = f"https://www.twitch.tv/{channel}"
+            stream = streams.get(channel.strip().lower())
+            if stream is None:
+                results[channel] = LiveResult(False, url)
+            else:
+                results[channel] = LiveResult(True, url, stream.get("title"), stream.get("id"))
+        return results
+
+    async def _fetch_streams(self, logins: list[str]) -> list[dict[str, Any]]:
+        streams: list[dict[str, Any]] = []
+        cursor: str | None = None
+        while True:
+            params: list[tuple[str, str]] = [("user_login", login) for login in logins]
+            params.append(("first", str(HELIX_MAX_LOGINS)))
+            if cursor:
+                params.append(("after", cursor))
+
+            payload = await self._helix_request("GET", "streams", params)
+            streams.extend(payload.get("data", []))
+            cursor = payload.get("pagination", {}).get("cursor")
+            if not cursor or not payload.get("data"):
+                return streams
+
+    async def user_ids(self, logins: Iterable[str]) -> dict[str, str]:
+        unique_logins = list(dict.fromkeys(login.strip().lower() for login in logins))
+        user_ids: dict[str, str] = {}
+        for start in range(0, len(unique_logins), HELIX_MAX_LOGINS):
+            params = [("login", login) for login in unique_logins[start : start + HELIX_MAX_LOGINS]]
+            payload = await self._helix_request("GET", "users", params)
+            for user in payload.get("data", []):
+                user_ids[str(user["login"]).lower()] = str(user["id"])
+        return user_ids
+
+    async def eventsub_subscriptions(self) -> list[dict[str, Any]]:
+        subscriptions: list[dict[str, Any]] = []
+        cursor: str | None = None
+        while True:
+            params = [("after", cursor)] if cursor else []
+            payload = await self._helix_request("GET", "eventsub/subscriptions", params)
+            subscriptions.extend(payload.get("data", []))
+            cursor = payload.get("pagination", {}).get("cursor")
+            if not cursor or not payload.get("data"):
+                return subscriptions
+
+    async def create_eventsub_subscription(
+        self, event_type: str, broadcaster_user_id: str, callback_url: str, secret: str
+    ) -> dict[str, Any]:
+        payload = await self._helix_request(
+            "POST",
+            "eventsub/subscriptions",
+            json={
+                "type": event_type,
+                "version": "1",
+                "condition": {"broadcaster_user_id": broadcaster_user_id},
+                "transport": {"method": "webhook", "callback": callback_url, "secret": secret},
             },
-            timeout=20,
         )
+        return payload.get("data", [{}])[0]
+
+    async def delete_eventsub_subscription(self, subscription_id: str) -> None:
+        await self._helix_request("DELETE", "eventsub/subscriptions", [("id", subscription_id)])
 
+    async def _helix_request(
+        self,
+        method: str,
+        path: str,
+        params: list[tuple[str, str]] | None = None,
+        json: dict[str, Any] | None = None,
+    ) -> dict[str, Any]:
+        url = f"{self._config.api_url}/{path}"
+        token = await self._ensure_token()
+        response = await self._transport.request(
+            method, url, params=params, json=json, headers=self._headers(token)
+        )
         if response.status_code == 401:
-            self._access_token = None
-            token = self._ensure_token()
-            response = requests.get(
-                "https://api.twitch.tv/helix/streams",
-                params={"user_login": channel},
-                headers={
-                    "Client-Id": self._config.client_id,
-                    "Authorization": f"Bearer {token}",
-                },
-                timeout=20,
+            self._invalidate_token(token)
+            token = await self._ensure_token()
+            response = await self._transport.request(
+                method, url, params=params, json=json, headers=self._headers(token)
             )
 
         response.raise_for_status()
-        data = response.json().get("data", [])
-        if not data:
-            return False, f"https://www.twitch.tv/{channel}", None
+        return response.json() if response.content else {}
 
-        stream = data[0]
-        return True, f"https://www.twitch.tv/{channel}", stream.get("title")
+    def _headers(self, token: str) -> dict[str, str]:
+        return {
+            "Client-Id": self._config.client_id,
+            "Authorization": f"Bearer {token}",
+        }
 
 
 class YouTubeClient:
-    def __init__(self, config: YouTubeConfig):
+    def __init__(self, config: YouTubeConfig, transport: HttpTransport):
         self._config = config
+        self._transport = transport
+        self._cache = self._load_cache(config.cache_file)
+        self._cache_dirty = False
 
-    def check_live(self, channel_id: str) -> tuple[bool, str, str | None]:
-        response = requests.get(
-            "https://www.googleapis.com/youtube/v3/search",
-            params={
-                "part": "snippet",
-                "channelId": channel_id,
-                "eventType": "live",
-                "type": "video",
-                "maxResults": 1,
-                "key": self._config.api_key,
-            },
-            timeout=20,
+    async def check_live(self, channel_id: str) -> LiveResult:
+        result = (await self.check_live_many([channel_id]))[channel_id]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def check_live_many(self, channel_ids: Iterable[str]) -> dict[str, LiveResult | Exception]:
+        requested = list(dict.fromkeys(channel_ids))
+        results: dict[str, LiveResult | Exception] = {}
+        try:
+            await self._resolve_uploads([channel_id for channel_id in requested if channel_id not in self._cache])
+
+            resolved: list[str] = []
+            for channel_id in requested:
+                if channel_id in self._cache:
+                    resolved.append(channel_id)
+                else:
+                    results[channel_id] = RuntimeError(f"YouTube channel not found: {channel_id}")
+
+            recent_ids = await asyncio.gather(
+                *(self._recent_video_ids(self._cache[channel_id]["uploads"]) for channel_id in resolved),
+                return_exceptions=True,
+            )
+
+            candidates: dict[str, str] = {}
+            for channel_id, channel_recent_ids in zip(resolved, recent_ids):
+                if isinstance(channel_recent_ids, BaseException):
+                    results[channel_id] = channel_recent_ids
+                    continue
+                entry = self._cache[channel_id]
+                for video_id in entry["live"] + entry["upcoming"]:
+                    candidates.setdefault(video_id, channel_id)
+                for video_id in channel_recent_ids:
+                    if video_id not in entry["seen"]:
+                        candidates.setdefault(video_id, channel_id)
+
+            videos = await self._fetch_videos(list(candidates))
+            for channel_id in requested:
+                if channel_id in results:
+                    continue
+                channel_candidates = [video_id for video_id, owner in candidates.items() if owner == channel_id]
+                results[channel_id] = self._update_channel(channel_id, channel_candidates, videos)
+        finally:
+            self._save_cache()
+        return results
+
+    async def check_video(self, channel_id: str, video_id: str) -> LiveResult:
+        try:
+            if channel_id not in self._cache:
+                await self._resolve_uploads([channel_id])
+            entry = self._cache.get(channel_id)
+            if entry is None:
+                raise RuntimeError(f"YouTube channel not found: {channel_id}")
+
+            candidates = list(dict.fromkeys([video_id, *entry["live"], *entry["upcoming"]]))
+            videos = await self._fetch_videos(candidates)
+            return self._update_channel(channel_id, candidates, videos)
+        finally:
+            self._save_cache()
+
+    async def _resolve_uploads(self, channel_ids: list[str]) -> None:
+        for start in range(0, len(channel_ids), YOUTUBE_MAX_IDS):
+            chunk = channel_ids[start : start + YOUTUBE_MAX_IDS]
+            payload = await self._api_get(
+                "channels",
+                {"part": "contentDetails", "id": ",".join(chunk), "maxResults": YOUTUBE_MAX_IDS},
+            )
+            for item in payload.get("items", []):
+                uploads = item.get("contentDetails", {}).get("relatedPlaylists", {}).get("uploads")
+                if item.get("id") in chunk and uploads:
+                    self._cache[item["id"]] = {"uploads": uploads, "live": [], "upcoming": [], "seen": []}
+                    self._cache_dirty = True
+
+    async def _recent_video_ids(self, playlist_id: str) -> list[str]:
+        payload = await self._api_get(
+            "playlistItems",
+            {"part": "contentDetails", "playlistId": playlist_id, "maxResults": self._config.recent_videos},
+        )
+        video_ids = [item.get("contentDetails", {}).get("videoId") for item in payload.get("items", [])]
+        return [video_id for video_id in video_ids if video_id]
+
+    async def _fetch_videos(self, video_ids: list[str]) -> dict[str, dict[str, Any]]:
+        videos: dict[str, dict[str, Any]] = {}
+        for start in range(0, len(video_ids), YOUTUBE_MAX_IDS):
+            chunk = video_ids[start : start + YOUTUBE_MAX_IDS]
+            payload = await self._api_get(
+                "videos",
+                {"part": "snippet,liveStreamingDetails", "id": ",".join(chunk), "maxResults": YOUTUBE_MAX_IDS},
+            )
+            for item in payload.get("items", []):
+                if item.get("id"):
+                    videos[item["id"]] = item
+        return videos
+
+    def _update_channel(
+        self, channel_id: str, candidate_ids: list[str], videos: dict[str, dict[str, Any]]
+    ) -> LiveResult:
+        entry = self._cache[channel_id]
+        live: list[str] = []
+        upcoming: list[str] = []
+        seen = list(entry["seen"])
+
+        for video_id in candidate_ids:
+            video = videos.get(video_id, {})
+            broadcast = video.get("snippet", {}).get("liveBroadcastContent")
+            ended = bool(video.get("liveStreamingDetails", {}).get("actualEndTime"))
+            if broadcast == "live" and not ended:
+                live.append(video_id)
+            elif broadcast == "upcoming":
+                upcoming.append(video_id)
+            elif video_id not in seen:
+                seen.append(video_id)
+
+        seen = seen[-YOUTUBE_SEEN_LIMIT:]
+        if live != entry["live"] or upcoming != entry["upcoming"] or seen != entry["seen"]:
+            entry.update(live=live, upcoming=upcoming, seen=seen)
+            self._cache_dirty = True
+
+        if not live:
+            scheduled = [
+                _parse_timestamp(videos.get(video_id, {}).get("liveStreamingDetails", {}).get("scheduledStartTime"))
+                for video_id in upcoming
+            ]
+            return LiveResult(
+                False,
+                f"https://www.youtube.com/channel/{channel_id}/live",
+                scheduled_start=min((start for start in scheduled if start is not None), default=None),
+            )
+
+        video_id = live[0]
+        return LiveResult(
+            True,
+            f"https://www.youtube.com/watch?v={video_id}",
+            videos[video_id].get("snippet", {}).get("title"),
+            video_id,
+        )
+
+    async def _api_get(self, resource: str, params: dict[str, Any]) -> dict[str, Any]:
+        YOUTUBE_QUOTA_UNITS.inc(YOUTUBE_QUOTA_COSTS.get(resource, 1), resource=resource)
+        response = await self._transport.request(
+            "GET",
+            f"{self._config.api_url}/{resource}",
+            params={**params, "key": self._config.api_key},
         )
         response.raise_for_status()
-        items = response.json().get("items", [])
+        return response.json()
+
+    @staticmethod
+    def _load_cache(path: Path) -> dict[str, dict[str, Any]]:
+        if not path.exists():
+            return {}
+
+        try:
+            payload = json.loads(path.read_text(encoding="utf-8"))
+            if isinstance(payload, dict):
+                return {
+                    channel_id: {
+                        "uploads": entry["uploads"],
+                        "live": list(entry.get("live", [])),
+                        "upcoming": list(entry.get("upcoming", [])),
+                        "seen": list(entry.get("seen", [])),
+                    }
+                    for channel_id, entry in payload.items()
+                    if isinstance(entry, dict) and entry.get("uploads")
+                }
+        except Exception:
+            LOG.exception("Failed to load YouTube cache file %s", path)
+
+        return {}
+
+    def _save_cache(self) -> None:
+        if not self._cache_dirty:
+            return
 
-        default_url = f"https://www.youtube.com/channel/{channel_id}/live"
-        if not items:
-            return False, default_url, None
+        try:
+            write_atomic(self._config.cache_file, json.dumps(self._cache).encode("utf-8"))
+            self._cache_dirty = False
+        except Exception:
+            LOG.exception("Failed to save YouTube cache file %s", self._config.cache_file)
 
-        first = items[0]
-        video_id = first.get("id", {}).get("videoId")
-        title = first.get("snippet", {}).get("title")
-        url = f"https://www.youtube.com/watch?v={video_id}" if video_id else default_url
-        return True, url, title
 
+def _parse_timestamp(value: Any) -> float | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
@@ -1,250 +1,644 @@
 import asyncio
-import json
 import logging
-import random
-from pathlib import Path
-from typing import Any
+import time
+from typing import AsyncIterator
 
-from telegram import Bot
+import httpx
 
-from .app_config import AppConfig
-from .stream_clients import TwitchClient, YouTubeClient
+from .app_config import AppConfig, NotificationTarget, Subscription, channel_key
+from .circuit_breaker import CLOSED, OPEN, CircuitBreaker, CircuitOpenError
+from .http_server import HttpServer
+from .http_transport import HttpTransport
+from .metrics import POLL_CYCLE_SECONDS, POLL_RESULTS
+from .poll_scheduler import PollScheduler, start_time_occurrences
+from .send_queue import SendQueue
+from .sharding import ShardCoordinator, SharedOutbox
+from .state_store import SubscriptionState, create_state_store
+from .twitch_eventsub import TwitchEventSub
+from .youtube_websub import YouTubeWebSub
+from .stream_clients import HELIX_MAX_LOGINS, YOUTUBE_MAX_IDS, LiveResult, TwitchClient, YouTubeClient
 
 
 LOG = logging.getLogger("stream-notifier")
+PLATFORM_BATCH_SIZES = {"twitch": HELIX_MAX_LOGINS, "youtube": YOUTUBE_MAX_IDS}
+PLATFORM_REQUEST_COSTS = {"twitch": 1 / HELIX_MAX_LOGINS, "youtube": 1 + 1 / YOUTUBE_MAX_IDS}
 
 
 class StreamMonitor:
-    def __init__(self, config: AppConfig, bot: Bot):
+    def __init__(
+        self,
+        config: AppConfig,
+        send_queue: SendQueue | SharedOutbox,
+        transport: HttpTransport,
+        server: HttpServer | None = None,
+    ):
         self._config = config
-        self._bot = bot
-        self._state = self._load_state(config.state_file)
-
-        self._twitch = TwitchClient(config.twitch) if config.twitch else None
-        self._youtube = YouTubeClient(config.youtube) if config.youtube else None
-
-    @staticmethod
-    def _load_state(path: Path) -> dict[str, bool]:
-        if not path.exists():
-            return {}
-
-        try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
-            if isinstance(payload, dict):
-                return {k: bool(v) for k, v in payload.items()}
-        except Exception:
-            LOG.exception("Failed to load state file %s", path)
-
-        return {}
-
-    def _save_state(self) -> None:
-        self._config.state_file.write_text(
-            json.dumps(self._state, indent=2),
-            encoding="utf-8",
-        )
+        self._send_queue = send_queue
+        self._state = create_state_store(config.state_backend, config.state_file)
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._snapshot: dict[tuple[str, str], tuple[LiveResult | Exception, float]] = {}
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+        self._scheduler = PollScheduler(config.schedule, config.poll_interval_seconds)
+        self._wakeup = asyncio.Event()
+        self._subs_by_channel: dict[tuple[str, str], list[Subscription]] = {}
+        self._channels_by_platform: dict[str, list[str]] = {}
+        self._owned_subs: dict[tuple[str, str], list[Subscription]] | None = None
+        self._index_subscriptions()
+
+        self._sub_locks: dict[str, asyncio.Lock] = {}
+        self._platform_breakers: dict[str, CircuitBreaker] = {}
+        self._channel_breakers: dict[tuple[str, str], CircuitBreaker] = {}
+        self._push_platforms: set[str] = set()
+        self._idle_intervals: dict[str, float] = {}
+        self._offline_pending: dict[str, tuple[float, int]] = {}
+        self._confirm_tasks: dict[tuple[str, str], asyncio.Task] = {}
+
+        self._shards: ShardCoordinator | None = None
+        if config.sharding:
+            self._shards = ShardCoordinator(config.sharding, on_change=self._shards_changed)
+
+        self._twitch = TwitchClient(config.twitch, transport) if config.twitch else None
+        self._youtube = YouTubeClient(config.youtube, transport) if config.youtube else None
+
+        self._eventsub: TwitchEventSub | None = None
+        if self._twitch and config.twitch.eventsub:
+            if server is None:
+                raise RuntimeError("twitch.eventsub requires http_server to be configured.")
+            self._eventsub = TwitchEventSub(
+                config.twitch.eventsub,
+                self._twitch,
+                server,
+                on_result=lambda channel, result: self.apply_push("twitch", channel, result),
+                on_reconcile=lambda channels: self._run_once([("twitch", channel) for channel in channels]),
+            )
+            self._push_platforms.add("twitch")
+
+        self._websub: YouTubeWebSub | None = None
+        if self._youtube and config.youtube.websub:
+            if server is None:
+                raise RuntimeError("youtube.websub requires http_server to be configured.")
+            self._websub = YouTubeWebSub(
+                config.youtube.websub,
+                self._youtube,
+                transport,
+                server,
+                on_result=lambda channel, result: self.apply_push("youtube", channel, result),
+            )
+            self._idle_intervals["youtube"] = config.youtube.websub.safety_poll_interval_seconds
+
+    def close(self) -> None:
+        if self._shards:
+            self._shards.close()
+        self._state.close()
+
+    def update_subscriptions(self, subscriptions: list[Subscription]) -> None:
+        old_subs = {sub.id: sub for sub in self._config.subscriptions}
+        new_subs = {sub.id: sub for sub in subscriptions}
+        for sub_id, sub in new_subs.items():
+            old_sub = old_subs.get(sub_id)
+            if old_sub is not None and old_sub.key != sub.key:
+                for target in old_sub.targets + sub.targets:
+                    self._state.set(target.state_key, SubscriptionState())
+                    self._offline_pending.pop(target.state_key, None)
+        for sub_id in old_subs.keys() - new_subs.keys():
+            self._sub_locks.pop(sub_id, None)
+        state_keys = {target.state_key for sub in subscriptions for target in sub.targets}
+        for state_key in self._offline_pending.keys() - state_keys:
+            del self._offline_pending[state_key]
+
+        self._config.subscriptions = subscriptions
+        self._index_subscriptions()
+        for key in list(self._snapshot):
+            if key not in self._subs_by_channel:
+                del self._snapshot[key]
+                self._channel_breakers.pop(key, None)
+
+        if self._eventsub:
+            self._eventsub.resync()
+        if self._websub:
+            self._websub.resync()
+        self._wakeup.set()
 
     async def run_forever(self) -> None:
         LOG.info("Starting monitor for %s subscriptions", len(self._config.subscriptions))
+        background_tasks: list[asyncio.Task] = []
+        if self._shards:
+            background_tasks.append(asyncio.create_task(self._shards.run()))
+        if self._twitch:
+            background_tasks.append(asyncio.create_task(self._twitch.maintain_token()))
+        if self._eventsub:
+            background_tasks.append(asyncio.create_task(self._eventsub.run(lambda: self._channels("twitch"))))
+        if self._websub:
+            background_tasks.append(asyncio.create_task(self._websub.run(lambda: self._channels("youtube"))))
         try:
             while True:
-                await self._run_once()
-                await asyncio.sleep(self._config.poll_interval_seconds)
+                now = time.time()
+                self._scheduler.sync(
+                    [
+                        key
+                        for key in self._subscriptions_by_channel(owned_only=True)
+                        if key[0] not in self._push_platforms
+                    ],
+                    now,
+                )
+                due_keys = self._scheduler.pop_due(now, self._request_cost)
+                if due_keys:
+                    try:
+                        await self._run_once(due_keys)
+                    finally:
+                        self._flush()
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=max(1.0, self._scheduler.seconds_until_due(time.time()))
+                    )
+                except asyncio.TimeoutError:
+                    pass
         except asyncio.CancelledError:
             LOG.info("Monitor task cancelled")
             raise
+        finally:
+            for task in background_tasks + list(self._confirm_tasks.values()):
+                task.cancel()
+
+    async def apply_push(self, platform: str, channel: str, result: LiveResult) -> None:
+        key = channel_key(platform, channel)
+        subs = self._subs_by_channel.get(key)
+        if subs:
+            self._record(key[0], key[1], result)
+            for sub in subs:
+                await self._apply_result(sub, result)
+            if key[0] not in self._push_platforms:
+                # Polled platforms still need pushed results, e.g. a scheduled start, in their schedule.
+                self._reschedule(key, subs, result)
+            if key[0] in self._push_platforms and self._offline_pending_for(key) and key not in self._confirm_tasks:
+                self._confirm_tasks[key] = asyncio.create_task(self._confirm_offline(key))
+        self._flush()
+
+    async def _confirm_offline(self, key: tuple[str, str]) -> None:
+        # Push platforms are not polled, so pending offline transitions are confirmed with extra checks.
+        try:
+            while self._offline_pending_for(key):
+                await asyncio.sleep(self._config.schedule.min_interval_seconds)
+                try:
+                    await self._run_once([key])
+                finally:
+                    self._flush()
+        except Exception:
+            LOG.exception("Failed to confirm offline status for %s:%s", *key)
+        finally:
+            self._confirm_tasks.pop(key, None)
+
+    def _offline_pending_for(self, key: tuple[str, str]) -> bool:
+        return any(
+            target.state_key in self._offline_pending
+            for sub in self._subs_by_channel.get(key, [])
+            for target in sub.targets
+        )
 
-    async def _run_once(self) -> None:
+    def _index_subscriptions(self) -> None:
+        self._subs_by_channel = {}
+        self._channels_by_platform = {}
+        for sub in self._config.subscriptions:
+            subs = self._subs_by_channel.setdefault(sub.key, [])
+            if not subs:
+                self._channels_by_platform.setdefault(sub.platform, []).append(sub.key[1])
+            subs.append(sub)
+        self._owned_subs = None
+
+    def _shards_changed(self) -> None:
+        self._owned_subs = None
+        self._state.reload()
+        self._wakeup.set()
+
+    def _flush(self) -> None:
+        self._send_queue.flush()
+        self._state.flush()
+
+    def _channels(self, platform: str) -> list[str]:
+        return self._channels_by_platform.get(platform, [])
+
+    async def _run_once(self, keys: list[tuple[str, str]] | None = None) -> None:
+        with POLL_CYCLE_SECONDS.time():
+            await self._poll(keys)
+
+    async def _poll(self, keys: list[tuple[str, str]] | None) -> None:
+        subs_by_channel = self._subscriptions_by_channel(owned_only=True)
+        if keys is not None:
+            subs_by_channel = {key: subs_by_channel[key] for key in keys if key in subs_by_channel}
         if self._config.log_polling:
-            LOG.info("Poll started for %s subscriptions", len(self._config.subscriptions))
-        checked = 0
-        live_count = 0
-        offline_count = 0
-        error_count = 0
+            LOG.info("Poll started for %s subscriptions", sum(len(subs) for subs in subs_by_channel.values()))
+        counts = {"live": 0, "offline": 0, "error": 0, "skipped": 0}
+
+        async for platform, results in self._check_stream(list(subs_by_channel)):
+            for channel, result in results.items():
+                subs = subs_by_channel.get((platform, channel), [])
+                for sub in subs:
+                    outcome = await self._apply_result(sub, result)
+                    counts[outcome] += 1
+                    POLL_RESULTS.inc(platform=platform, result=outcome)
+                self._reschedule((platform, channel), subs, result)
 
-        for sub in self._config.subscriptions:
-            sub_id = sub["id"]
-            platform = sub["platform"].lower()
-            channel = sub["channel"]
-            channel_name = sub.get("display_name", channel)
+        if self._config.log_polling:
+            LOG.info(
+                "Poll complete: checked=%s live=%s offline=%s errors=%s skipped=%s",
+                counts["live"] + counts["offline"],
+                counts["live"],
+                counts["offline"],
+                counts["error"],
+                counts["skipped"],
+            )
 
-            try:
-                is_live, url, title = self._check_live(platform, channel)
-            except Exception:
-                LOG.exception("Failed to check stream status for %s", sub_id)
-                error_count += 1
-                continue
+    def _subscriptions_by_channel(self, owned_only: bool = False) -> dict[tuple[str, str], list[Subscription]]:
+        if not owned_only or self._shards is None:
+            return self._subs_by_channel
+        if self._owned_subs is None:
+            self._owned_subs = {key: subs for key, subs in self._subs_by_channel.items() if self._shards.owns(key)}
+        return self._owned_subs
 
-            live_message_sent = bool(self._state.get(sub_id, False))
-            checked += 1
-            if is_live:
-                live_count += 1
-            else:
-                offline_count += 1
+    @staticmethod
+    def _request_cost(key: tuple[str, str]) -> float:
+        return PLATFORM_REQUEST_COSTS.get(key[0], 1.0)
+
+    def _reschedule(
+        self, key: tuple[str, str], subs: list[Subscription], result: LiveResult | Exception
+    ) -> None:
+        now = time.time()
+        hot_times: list[float] = []
+        for sub in subs:
+            for start_time in sub.start_times:
+                hot_times.extend(start_time_occurrences(start_time, sub.timezone, now))
+            for target in sub.targets:
+                state = self._state.get(target.state_key)
+                if not state.live and state.changed_at is not None:
+                    hot_times.append(state.changed_at)
+                if target.state_key in self._offline_pending:
+                    hot_times.append(now)
+        if isinstance(result, LiveResult) and result.scheduled_start is not None:
+            hot_times.append(result.scheduled_start)
+
+        self._scheduler.record(
+            key,
+            now,
+            live=isinstance(result, LiveResult) and result.is_live,
+            error=isinstance(result, Exception),
+            hot_times=hot_times,
+            idle_interval=self._idle_intervals.get(key[0]),
+        )
+
+    async def _apply_result(self, sub: Subscription, result: LiveResult | Exception) -> str:
+        if isinstance(result, CircuitOpenError):
+            return "skipped"
+        if isinstance(result, Exception):
+            LOG.error("Failed to check stream status for %s", sub.id, exc_info=result)
+            return "error"
+
+        async with self._sub_locks.setdefault(sub.id, asyncio.Lock()):
+            await self._apply_transition(sub, result)
+        return "live" if result.is_live else "offline"
+
+    async def _apply_transition(self, sub: Subscription, result: LiveResult) -> None:
+        for target in sub.targets:
+            state = self._state.get(target.state_key)
             if self._config.log_polling:
                 LOG.info(
                     "Poll status: id=%s platform=%s channel=%s is_live=%s notified_live=%s title=%s url=%s",
-                    sub_id,
-                    platform,
-                    channel,
-                    is_live,
-                    live_message_sent,
-                    title or "",
-                    url,
+                    target.state_key,
+                    sub.platform,
+                    sub.channel,
+                    result.is_live,
+                    state.live,
+                    result.title or "",
+                    result.url,
                 )
 
-            if is_live and not live_message_sent:
-                if not await self._send_notification(
-                    sub=sub,
-                    sub_id=sub_id,
-                    platform=platform,
-                    channel=channel,
-                    channel_name=channel_name,
-                    title=title,
-                    url=url,
-                    is_live=True,
-                ):
+            if result.is_live:
+                self._offline_pending.pop(target.state_key, None)
+                if state.live:
+                    if result.stream_id is not None and result.stream_id != state.stream_id:
+                        self._state.set(
+                            target.state_key,
+                            SubscriptionState(live=True, stream_id=result.stream_id, changed_at=state.changed_at),
+                        )
                     continue
-                self._state[sub_id] = True
-                self._save_state()
-                continue
-
-            if not is_live and live_message_sent:
-                if not await self._send_notification(
-                    sub=sub,
-                    sub_id=sub_id,
-                    platform=platform,
-                    channel=channel,
-                    channel_name=channel_name,
-                    title=title,
-                    url=url,
-                    is_live=False,
-                ):
+                if result.stream_id is not None and result.stream_id == state.stream_id:
+                    # The offline notice for this broadcast was already sent; keeping the state offline
+                    # means its eventual end is not announced a second time either.
+                    LOG.debug("Stream %s resumed for %s, not notifying again", result.stream_id, target.state_key)
+                    continue
+            else:
+                if not state.live:
+                    self._offline_pending.pop(target.state_key, None)
+                    continue
+                if not self._offline_confirmed(sub, target.state_key):
                     continue
-                self._state[sub_id] = False
-                self._save_state()
 
-        if self._config.log_polling:
-            LOG.info(
-                "Poll complete: checked=%s live=%s offline=%s errors=%s",
-                checked,
-                live_count,
-                offline_count,
-                error_count,
-            )
+            if await self._send_notification(sub, target, result):
+                self._state.set(
+                    target.state_key,
+                    SubscriptionState(
+                        live=result.is_live,
+                        stream_id=result.stream_id if result.is_live else state.stream_id,
+                        changed_at=time.time(),
+                    ),
+                )
 
-    async def _send_notification(
-        self,
-        sub: dict[str, Any],
-        sub_id: str,
-        platform: str,
-        channel: str,
-        channel_name: str,
-        title: str | None,
-        url: str,
-        is_live: bool,
-    ) -> bool:
-        template_key = "live_message" if is_live else "offline_message"
-        template = self._pick_template(sub.get(template_key))
-        if not template:
-            LOG.warning("No %s configured for %s", template_key, sub_id)
+    def _offline_confirmed(self, sub: Subscription, state_key: str) -> bool:
+        now = time.time()
+        first_seen, observations = self._offline_pending.get(state_key, (now, 0))
+        observations += 1
+        debounce = sub.offline_debounce
+        if observations >= debounce.confirmations and now - first_seen >= debounce.grace_seconds:
+            self._offline_pending.pop(state_key, None)
+            return True
+
+        if observations == 1:
+            LOG.info("%s looks offline, waiting for confirmation", state_key)
+        self._offline_pending[state_key] = (first_seen, observations)
+        return False
+
+    async def _send_notification(self, sub: Subscription, target: NotificationTarget, result: LiveResult) -> bool:
+        template = target.live_message if result.is_live else target.offline_message
+        if template is None:
+            template_key = "live_message" if result.is_live else "offline_message"
+            LOG.warning("No %s configured for %s", template_key, target.state_key)
             return False
 
-        text = self._render(template, platform, channel_name, channel, title, url, is_live)
-        try:
-            if is_live:
-                await self._bot.send_message(
-                    chat_id=self._config.telegram.chat_id,
-                    message_thread_id=self._config.telegram.stream_message_thread_id,
-                    text=url,
-                )
-            await self._bot.send_message(
-                chat_id=self._config.telegram.chat_id,
-                message_thread_id=self._config.telegram.stream_message_thread_id,
-                text=text,
-            )
-        except Exception:
-            LOG.exception("Failed to send %s notification for %s", "live" if is_live else "offline", sub_id)
-            return False
+        text = template.render(
+            {
+                "platform": sub.platform,
+                "display_name": sub.display_name,
+                "channel": sub.channel,
+                "title": result.title or "",
+                "status": "live" if result.is_live else "offline",
+                "url": result.url,
+            }
+        )
+        chat = {"chat_id": target.chat_id, "message_thread_id": target.message_thread_id}
+        if result.is_live:
+            self._send_queue.enqueue("send_message", **chat, text=result.url)
+        self._send_queue.enqueue("send_message", **chat, text=text)
 
-        LOG.info("Sent %s notification for %s", "live" if is_live else "offline", sub_id)
+        LOG.info("Queued %s notification for %s", "live" if result.is_live else "offline", target.state_key)
         return True
 
-    def build_status_report(self) -> str:
+    def status_needs_refresh(self, sub_id: str | None = None) -> bool:
+        return bool(self._stale_keys(self._status_subscriptions(sub_id), force=sub_id is not None))
+
+    async def build_status_report(self, sub_id: str | None = None) -> str:
         if not self._config.subscriptions:
             return "No subscriptions configured."
 
+        subscriptions = self._status_subscriptions(sub_id)
+        if not subscriptions:
+            return f"Unknown subscription: {sub_id}"
+
+        stale_keys = self._stale_keys(subscriptions, force=sub_id is not None)
+        if stale_keys:
+            async for _ in self._check_stream(stale_keys):
+                pass
+
+        now = time.time()
         lines: list[str] = []
+        for platform in sorted({sub.platform for sub in subscriptions}):
+            breaker = self._platform_breakers.get(platform)
+            if breaker is not None and breaker.state != CLOSED:
+                lines.append(f"- {platform} API: {_describe_breaker(breaker, now)} - {breaker.last_error}")
         live_count = 0
         offline_count = 0
         error_count = 0
 
-        for sub in self._config.subscriptions:
-            sub_id = sub["id"]
-            platform = sub["platform"].lower()
-            channel = sub["channel"]
-            display_name = sub.get("display_name", channel)
-
-            try:
-                is_live, url, title = self._check_live(platform, channel)
-            except Exception as exc:
+        for sub in subscriptions:
+            sub_id = sub.id
+            platform = sub.platform
+            display_name = sub.display_name
+
+            result, checked_at = self._snapshot[sub.key]
+            age = f" ({_format_age(now - checked_at)} ago)"
+            breaker = self._channel_breakers.get(sub.key)
+            if breaker is not None and breaker.state != CLOSED:
+                age += f" [{_describe_breaker(breaker, now)}]"
+            if isinstance(result, Exception):
                 error_count += 1
-                lines.append(f"- {display_name} ({platform}) [{sub_id}]: ERROR - {exc}")
+                lines.append(f"- {display_name} ({platform}) [{sub_id}]: ERROR - {result}{age}")
                 continue
+            is_live, url, title = result.is_live, result.url, result.title
 
             if is_live:
                 live_count += 1
                 title_suffix = f" | {title}" if title else ""
-                lines.append(f"- {display_name} ({platform}) [{sub_id}]: LIVE{title_suffix} | {url}")
+                lines.append(f"- {display_name} ({platform}) [{sub_id}]: LIVE{title_suffix} | {url}{age}")
             else:
                 offline_count += 1
-                lines.append(f"- {display_name} ({platform}) [{sub_id}]: OFFLINE | {url}")
+                lines.append(f"- {display_name} ({platform}) [{sub_id}]: OFFLINE | {url}{age}")
 
         summary = (
             f"Status check complete: {live_count} live, {offline_count} offline, {error_count} errors."
         )
         return f"{summary}\n" + "\n".join(lines)
 
-    def _check_live(self, platform: str, channel: str) -> tuple[bool, str, str | None]:
+    def _status_subscriptions(self, sub_id: str | None) -> list[Subscription]:
+        if sub_id is None:
+            return self._config.subscriptions
+        return [sub for sub in self._config.subscriptions if sub.id == sub_id]
+
+    def _stale_keys(self, subscriptions: list[Subscription], force: bool) -> list[tuple[str, str]]:
+        oldest = time.time() - self._config.status_max_age_seconds
+        keys = dict.fromkeys(sub.key for sub in subscriptions)
+        now = time.time()
+        # Blocked keys without a snapshot still go to _check_stream, which records the open circuit.
+        return [
+            key
+            for key in keys
+            if key not in self._snapshot
+            or ((force or self._snapshot[key][1] < oldest) and self._circuit_error(key, now) is None)
+        ]
+
+    async def _check_stream(
+        self, keys: list[tuple[str, str]]
+    ) -> AsyncIterator[tuple[str, dict[str, LiveResult | Exception]]]:
+        loop = asyncio.get_running_loop()
+        now = time.time()
+        channels_by_platform: dict[str, list[str]] = {}
+        waiting: list[tuple[tuple[str, str], asyncio.Future]] = []
+        skipped: dict[str, dict[str, LiveResult | Exception]] = {}
+        for key in keys:
+            if key in self._inflight:
+                waiting.append((key, self._inflight[key]))
+                continue
+            circuit_error = self._circuit_error(key, now)
+            if circuit_error is not None:
+                self._snapshot.setdefault(key, (circuit_error, now))
+                skipped.setdefault(key[0], {})[key[1]] = circuit_error
+                continue
+            self._platform_breaker(key[0]).acquire(now)
+            self._channel_breaker(key).acquire(now)
+            self._inflight[key] = loop.create_future()
+            channels_by_platform.setdefault(key[0], []).append(key[1])
+
+        tasks = [
+            asyncio.create_task(self._check_batch(platform, channels[start : start + batch_size]))
+            for platform, channels in channels_by_platform.items()
+            for batch_size in [PLATFORM_BATCH_SIZES.get(platform, 1)]
+            for start in range(0, len(channels), batch_size)
+        ]
+        tasks.extend(asyncio.create_task(self._wait_inflight(key, future)) for key, future in waiting)
+        try:
+            for platform, results in skipped.items():
+                yield platform, results
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _wait_inflight(
+        self, key: tuple[str, str], future: asyncio.Future
+    ) -> tuple[str, dict[str, LiveResult | Exception]]:
+        platform, channel = key
+        try:
+            return platform, {channel: await asyncio.shield(future)}
+        except asyncio.CancelledError:
+            if not future.cancelled():
+                raise
+            error = RuntimeError(f"{platform} check was cancelled")
+            # A key that was never checked still needs a snapshot entry for the status report.
+            self._snapshot.setdefault(key, (error, time.time()))
+            return platform, {channel: error}
+
+    async def _check_batch(
+        self, platform: str, channels: list[str]
+    ) -> tuple[str, dict[str, LiveResult | Exception]]:
+        try:
+            results = await self._run_batch(platform, channels)
+            self._update_breakers(platform, results)
+            for channel, result in results.items():
+                self._record(platform, channel, result)
+            return platform, results
+        finally:
+            for channel in channels:
+                future = self._inflight.pop((platform, channel), None)
+                if future is not None and not future.done():
+                    future.cancel()
+
+    async def _run_batch(
+        self, platform: str, channels: list[str]
+    ) -> dict[str, LiveResult | Exception]:
+        timeout = self._config.poll_request_timeout_seconds
+        semaphore = self._semaphores.get(platform)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self._config.poll_concurrency.get(platform, 1))
+            self._semaphores[platform] = semaphore
+
+        async with semaphore:
+            try:
+                results = await asyncio.wait_for(self._check_many(platform, channels), timeout=timeout)
+            except asyncio.TimeoutError:
+                error = TimeoutError(f"{platform} check timed out after {timeout}s")
+                return {channel: error for channel in channels}
+            except Exception as exc:
+                return {channel: exc for channel in channels}
+
+        missing = RuntimeError(f"No {platform} result returned")
+        return {channel: results.get(channel, missing) for channel in channels}
+
+    def _circuit_error(self, key: tuple[str, str], now: float) -> CircuitOpenError | None:
+        platform_breaker = self._platform_breaker(key[0])
+        if platform_breaker.blocked(now):
+            return CircuitOpenError(f"{key[0]} API {_describe_breaker(platform_breaker, now)}")
+        channel_breaker = self._channel_breaker(key)
+        if channel_breaker.blocked(now):
+            return CircuitOpenError(_describe_breaker(channel_breaker, now))
+        return None
+
+    def _platform_breaker(self, platform: str) -> CircuitBreaker:
+        breaker = self._platform_breakers.get(platform)
+        if breaker is None:
+            breaker = CircuitBreaker(self._config.circuit_breaker)
+            self._platform_breakers[platform] = breaker
+        return breaker
+
+    def _channel_breaker(self, key: tuple[str, str]) -> CircuitBreaker:
+        breaker = self._channel_breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(self._config.circuit_breaker)
+            self._channel_breakers[key] = breaker
+        return breaker
+
+    def _update_breakers(self, platform: str, results: dict[str, LiveResult | Exception]) -> None:
+        now = time.time()
+        outages = [result for result in results.values() if isinstance(result, Exception) and _is_outage(result)]
+        if outages and len(outages) == len(results):
+            self._trip(self._platform_breaker(platform), f"{platform} API", outages[0], now)
+        else:
+            self._reset(self._platform_breaker(platform), f"{platform} API")
+
+        for channel, result in results.items():
+            if not isinstance(result, Exception):
+                self._reset(self._channel_breaker((platform, channel)), f"{platform}/{channel}")
+            elif not _is_outage(result):
+                self._trip(self._channel_breaker((platform, channel)), f"{platform}/{channel}", result, now)
+
+    @staticmethod
+    def _trip(breaker: CircuitBreaker, name: str, error: Exception, now: float) -> None:
+        was_open = breaker.state == OPEN
+        breaker.record_failure(error, now)
+        if breaker.state == OPEN and not was_open:
+            LOG.warning(
+                "Circuit for %s opened for %s after %s failures: %s",
+                name,
+                _format_age(breaker.retry_at - now),
+                breaker.failures,
+                breaker.last_error,
+            )
+
+    @staticmethod
+    def _reset(breaker: CircuitBreaker, name: str) -> None:
+        if breaker.state != CLOSED:
+            LOG.info("Circuit for %s closed", name)
+        breaker.record_success()
+
+    def _record(self, platform: str, channel: str, result: LiveResult | Exception) -> None:
+        self._snapshot[(platform, channel)] = (result, time.time())
+        future = self._inflight.pop((platform, channel), None)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    async def _check_many(self, platform: str, channels: list[str]) -> dict[str, LiveResult | Exception]:
         if platform == "twitch":
             if not self._twitch:
                 raise RuntimeError("Twitch subscription found but Twitch API config is missing")
-            return self._twitch.check_live(channel)
+            return await self._twitch.check_live_many(channels)
 
         if platform == "youtube":
             if not self._youtube:
                 raise RuntimeError("YouTube subscription found but YouTube API config is missing")
-            return self._youtube.check_live(channel)
+            return await self._youtube.check_live_many(channels)
 
         raise ValueError(f"Unsupported platform: {platform}")
 
-    @staticmethod
-    def _pick_template(template_value: Any) -> str | None:
-        if isinstance(template_value, str):
-            return template_value
-
-        if isinstance(template_value, list):
-            options = [item for item in template_value if isinstance(item, str) and item.strip()]
-            if options:
-                return random.choice(options)
-
-        return None
-
-    @staticmethod
-    def _render(
-        template: str,
-        platform: str,
-        display_name: str,
-        channel: str,
-        title: str | None,
-        url: str,
-        is_live: bool,
-    ) -> str:
-        return template.format(
-            platform=platform,
-            display_name=display_name,
-            channel=channel,
-            title=title or "",
-            status="live" if is_live else "offline",
-            url=url,
-        ).strip()
 
+def _is_outage(error: Exception) -> bool:
+    if isinstance(error, (httpx.TransportError, TimeoutError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        if status == 403:
+            return "quotaExceeded" in error.response.text or "rateLimitExceeded" in error.response.text
+        return status in (401, 429) or status >= 500
+    return False
+
+
+def _describe_breaker(breaker: CircuitBreaker, now: float) -> str:
+    if breaker.state == OPEN:
+        return f"circuit open, retry in {_format_age(breaker.retry_at - now)}"
+    return f"circuit {breaker.state}"
+
+
+def _format_age(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
@@ -1,16 +1,45 @@
 import asyncio
 import logging
-import re
+import math
+import signal
 from io import BytesIO
 
-from telegram import BotCommand, InputFile, Update
+from telegram import (
+    BotCommand,
+    InputFile,
+    InputMediaAudio,
+    InputMediaDocument,
+    InputMediaPhoto,
+    InputMediaVideo,
+    Message,
+    Update,
+)
+from telegram.error import BadRequest
 from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
 
-from .app_config import fetch_remote_resource, load_config
+from .app_config import AppConfig, CommandAttachment, CommandPlan, load_config
+from .config_reloader import ConfigReloader
+from . import metrics
+from .http_server import HttpRequest, HttpResponse, HttpServer
+from .http_transport import HttpTransport
+from .resource_cache import CachedResource, FileIdStore, ResourceCache
+from .send_queue import SendQueue
+from .sharding import SharedOutbox
 from .stream_monitor import StreamMonitor
+from .telegram_webhook import TelegramWebhook
 
 LOG = logging.getLogger("telegram-runtime")
-FILE_REF_PATTERN = re.compile(r"file:([^\s]+)")
+# CommandHandler and MessageHandler match commands in new and edited messages; nothing else is handled.
+ALLOWED_UPDATES = [Update.MESSAGE, Update.EDITED_MESSAGE]
+MEDIA_GROUP_MAX_ITEMS = 10
+# Telegram albums may mix photos and videos, but documents and audio only group with their own kind.
+MEDIA_GROUP_KINDS = {"photo": "visual", "video": "visual", "audio": "audio", "document": "document"}
+INPUT_MEDIA = {
+    "photo": InputMediaPhoto,
+    "video": InputMediaVideo,
+    "audio": InputMediaAudio,
+    "document": InputMediaDocument,
+}
 
 
 async def _ensure_allowed_chat(
@@ -33,13 +62,20 @@ async def _ensure_allowed_chat(
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     monitor: StreamMonitor = context.application.bot_data["monitor"]
+    send_queue: SendQueue = context.application.bot_data["send_queue"]
 
     if not await _ensure_allowed_chat(update):
         return
 
-    await update.effective_message.reply_text("Checking subscription status...")
-    report = await asyncio.to_thread(monitor.build_status_report)
-    await update.effective_message.reply_text(report)
+    target = {
+        "chat_id": update.effective_chat.id,
+        "message_thread_id": update.effective_message.message_thread_id,
+    }
+    sub_id = context.args[0] if context.args else None
+    if monitor.status_needs_refresh(sub_id):
+        await send_queue.send("send_message", **target, text="Checking subscription status...")
+    report = await monitor.build_status_report(sub_id)
+    await send_queue.send("send_message", **target, text=report)
 
 
 def _extract_command_name(update: Update) -> str | None:
@@ -65,9 +101,10 @@ async def dynamic_command_router(update: Update, context: ContextTypes.DEFAULT_T
         return
 
     application = context.application
-    dynamic_commands: dict[str, str] = application.bot_data["dynamic_commands"]
-    template = dynamic_commands.get(command_name)
-    if template is None:
+    send_queue: SendQueue = application.bot_data["send_queue"]
+    dynamic_commands: dict[str, CommandPlan] = application.bot_data["dynamic_commands"]
+    plan = dynamic_commands.get(command_name)
+    if plan is None:
         return
 
     if not await _ensure_allowed_chat(update):
@@ -82,44 +119,148 @@ async def dynamic_command_router(update: Update, context: ContextTypes.DEFAULT_T
         else None
     )
 
-    file_refs = FILE_REF_PATTERN.findall(template)
-    for ref in file_refs:
-        try:
-            content, filename = await asyncio.to_thread(fetch_remote_resource, ref)
-        except Exception:
-            LOG.exception("Failed to fetch dynamic command resource: %s", ref)
-            await context.bot.send_message(
-                chat_id=target_chat_id,
-                message_thread_id=target_thread_id,
-                text=f"Failed to load resource: {ref}",
-            )
-            continue
-
-        await context.bot.send_document(
+    if plan.attachments:
+        resource_cache: ResourceCache = application.bot_data["resource_cache"]
+        results = await asyncio.gather(
+            *(resource_cache.get(attachment.path) for attachment in plan.attachments), return_exceptions=True
+        )
+        ready: list[tuple[CommandAttachment, CachedResource]] = []
+        for attachment, result in zip(plan.attachments, results):
+            if isinstance(result, BaseException):
+                LOG.error("Failed to fetch dynamic command resource: %s", attachment.path, exc_info=result)
+                await send_queue.send(
+                    "send_message",
+                    chat_id=target_chat_id,
+                    message_thread_id=target_thread_id,
+                    text=f"Failed to load resource: {attachment.path}",
+                )
+                continue
+            ready.append((attachment, result))
+
+        for batch in _media_batches(ready):
+            await _send_resources(context, target_chat_id, target_thread_id, batch)
+
+    if plan.text:
+        await send_queue.send(
+            "send_message",
             chat_id=target_chat_id,
             message_thread_id=target_thread_id,
-            document=InputFile(BytesIO(content), filename=filename),
+            text=plan.text,
         )
 
-    text_response = FILE_REF_PATTERN.sub("", template).strip()
-    if text_response:
-        await context.bot.send_message(
-            chat_id=target_chat_id,
-            message_thread_id=target_thread_id,
-            text=text_response,
+
+def _media_batches(
+    ready: list[tuple[CommandAttachment, CachedResource]],
+) -> list[list[tuple[CommandAttachment, CachedResource]]]:
+    groups: dict[str, list[tuple[CommandAttachment, CachedResource]]] = {}
+    for attachment, resource in ready:
+        groups.setdefault(MEDIA_GROUP_KINDS[attachment.media_type], []).append((attachment, resource))
+    return [
+        items[start : start + MEDIA_GROUP_MAX_ITEMS]
+        for items in groups.values()
+        for start in range(0, len(items), MEDIA_GROUP_MAX_ITEMS)
+    ]
+
+
+async def _send_resources(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: str,
+    thread_id: int | None,
+    batch: list[tuple[CommandAttachment, CachedResource]],
+) -> None:
+    send_queue: SendQueue = context.application.bot_data["send_queue"]
+    file_ids: FileIdStore = context.application.bot_data["file_ids"]
+    stored = [file_ids.get(resource) for _, resource in batch]
+    try:
+        messages = await _send_media(send_queue, chat_id, thread_id, batch, stored)
+    except BadRequest:
+        if not any(stored):
+            raise
+        LOG.warning(
+            "Stored Telegram file ids for %s were rejected, uploading again",
+            ", ".join(resource.path for (_, resource), file_id in zip(batch, stored) if file_id is not None),
+        )
+        for (_, resource), file_id in zip(batch, stored):
+            if file_id is not None:
+                file_ids.discard(resource)
+        stored = [None] * len(batch)
+        messages = await _send_media(send_queue, chat_id, thread_id, batch, stored)
+
+    for (attachment, resource), file_id, message in zip(batch, stored, messages):
+        new_file_id = _message_file_id(message, attachment.media_type)
+        if new_file_id is not None and new_file_id != file_id:
+            file_ids.set(resource, new_file_id)
+
+
+async def _send_media(
+    send_queue: SendQueue,
+    chat_id: str,
+    thread_id: int | None,
+    batch: list[tuple[CommandAttachment, CachedResource]],
+    file_ids: list[str | None],
+) -> list[Message]:
+    media = [
+        file_id or InputFile(BytesIO(resource.content), filename=resource.filename)
+        for (_, resource), file_id in zip(batch, file_ids)
+    ]
+    if len(batch) == 1:
+        media_type = batch[0][0].media_type
+        message = await send_queue.send(
+            f"send_{media_type}", chat_id=chat_id, message_thread_id=thread_id, **{media_type: media[0]}
         )
+        return [message]
+
+    messages = await send_queue.send(
+        "send_media_group",
+        chat_id=chat_id,
+        message_thread_id=thread_id,
+        media=[INPUT_MEDIA[attachment.media_type](item) for (attachment, _), item in zip(batch, media)],
+    )
+    return list(messages)
+
+
+def _message_file_id(message: Message, media_type: str) -> str | None:
+    media = getattr(message, media_type, None)
+    if isinstance(media, (list, tuple)):
+        media = media[-1] if media else None
+    return media.file_id if media is not None else None
+
+
+async def metrics_endpoint(request: HttpRequest) -> HttpResponse:
+    return HttpResponse(body=metrics.render().encode("utf-8"), content_type=metrics.CONTENT_TYPE)
 
 
 async def on_startup(application: Application) -> None:
+    send_queue: SendQueue = application.bot_data["send_queue"]
+    await send_queue.start()
+    server: HttpServer | None = application.bot_data.get("http_server")
+    if server:
+        await server.start()
     monitor: StreamMonitor = application.bot_data["monitor"]
     application.bot_data["monitor_task"] = application.create_task(monitor.run_forever())
+    config: AppConfig = application.bot_data["config"]
+    reloader = ConfigReloader(
+        config, application.bot_data["transport"], lambda new_config: _apply_config(application, new_config)
+    )
+    application.bot_data["reload_task"] = application.create_task(reloader.run())
     await _refresh_bot_commands(application)
 
 
+async def _apply_config(application: Application, new_config: AppConfig) -> None:
+    config: AppConfig = application.bot_data["config"]
+    if new_config.subscriptions != config.subscriptions:
+        monitor: StreamMonitor = application.bot_data["monitor"]
+        monitor.update_subscriptions(new_config.subscriptions)
+    if new_config.dynamic_commands != config.dynamic_commands:
+        config.dynamic_commands = new_config.dynamic_commands
+        application.bot_data["dynamic_commands"] = new_config.dynamic_commands
+        await _refresh_bot_commands(application)
+
+
 async def _refresh_bot_commands(application: Application) -> None:
     dynamic_commands: dict[str, str] = application.bot_data["dynamic_commands"]
     commands = [
-        BotCommand("status", "Show live/offline status"),
+        BotCommand("status", "Show live/offline status (optionally for one subscription id)"),
     ]
     commands.extend(
         BotCommand(name, "Dynamic command")
@@ -130,35 +271,78 @@ async def _refresh_bot_commands(application: Application) -> None:
 
 
 async def on_shutdown(application: Application) -> None:
-    task: asyncio.Task | None = application.bot_data.get("monitor_task")
-    if task:
-        task.cancel()
-        try:
-            await task
-        except asyncio.CancelledError:
-            pass
+    for task_key in ("reload_task", "monitor_task"):
+        task: asyncio.Task | None = application.bot_data.get(task_key)
+        if task:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    monitor: StreamMonitor | None = application.bot_data.get("monitor")
+    if monitor:
+        monitor.close()
+
+    send_queue: SendQueue | None = application.bot_data.get("send_queue")
+    if send_queue:
+        await send_queue.stop()
+
+    outbox: SharedOutbox | None = application.bot_data.get("outbox")
+    if outbox:
+        outbox.close()
+
+    server: HttpServer | None = application.bot_data.get("http_server")
+    if server:
+        await server.stop()
+
+    transport: HttpTransport | None = application.bot_data.get("transport")
+    if transport:
+        await transport.aclose()
+
+
+async def _run_webhook(application: Application) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    webhook: TelegramWebhook = application.bot_data["webhook"]
+    await application.initialize()
+    try:
+        await application.post_init(application)
+        await application.start()
+        await webhook.register(ALLOWED_UPDATES)
+        await stop.wait()
+    finally:
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
 
 
 def _log_startup_config(config) -> None:
     LOG.info(
-        "Startup config: chat_id=%s thread_id=%s poll_interval_seconds=%s log_polling=%s state_file=%s subscriptions=%s dynamic_commands=%s twitch_enabled=%s youtube_enabled=%s",
+        "Startup config: chat_id=%s thread_id=%s updates=%s poll_interval_seconds=%s log_polling=%s state_file=%s subscriptions=%s dynamic_commands=%s twitch_enabled=%s twitch_eventsub=%s youtube_enabled=%s",
         config.telegram.chat_id,
         config.telegram.stream_message_thread_id,
+        "webhook" if config.telegram.webhook else "polling",
         config.poll_interval_seconds,
         config.log_polling,
         str(config.state_file),
         len(config.subscriptions),
         len(config.dynamic_commands),
         bool(config.twitch),
+        bool(config.twitch and config.twitch.eventsub),
         bool(config.youtube),
     )
     for sub in config.subscriptions:
         LOG.info(
             "Subscription: id=%s platform=%s channel=%s display_name=%s",
-            sub.get("id"),
-            sub.get("platform"),
-            sub.get("channel"),
-            sub.get("display_name", sub.get("channel")),
+            sub.id,
+            sub.platform,
+            sub.channel,
+            sub.display_name,
         )
     if config.dynamic_commands:
         LOG.info("Dynamic commands: %s", ", ".join(sorted(config.dynamic_commands.keys())))
@@ -175,27 +359,47 @@ def run_bot(
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
 
-    config = load_config()
+    config = load_config(max_age_seconds=math.inf)
     _log_startup_config(config)
     application = (
         Application.builder()
         .token(config.telegram.bot_token)
+        .base_url(f"{config.telegram.api_url}/bot")
+        .base_file_url(f"{config.telegram.api_url}/file/bot")
         .post_init(on_startup)
         .post_shutdown(on_shutdown)
         .build()
     )
 
-    monitor = StreamMonitor(config, bot=application.bot)
+    transport = HttpTransport(config.http)
+    server = HttpServer(config.http_server) if config.http_server else None
+    if server:
+        server.add_route("GET", "/metrics", metrics_endpoint)
+    outbox = SharedOutbox(config.sharding.database) if config.sharding else None
+    send_queue = SendQueue(config.send_queue, application.bot, outbox=outbox)
+    monitor = StreamMonitor(config, send_queue=send_queue, transport=transport, server=server)
     application.bot_data["config"] = config
+    application.bot_data["transport"] = transport
+    application.bot_data["send_queue"] = send_queue
+    application.bot_data["outbox"] = outbox
+    application.bot_data["http_server"] = server
+    application.bot_data["resource_cache"] = ResourceCache(config.resource_cache, transport)
+    application.bot_data["file_ids"] = FileIdStore(config.resource_cache.directory / "file_ids.json")
     application.bot_data["dynamic_commands"] = config.dynamic_commands
     application.bot_data["monitor"] = monitor
+    if config.telegram.webhook:
+        application.bot_data["webhook"] = TelegramWebhook(config.telegram.webhook, application, server)
 
     application.add_handler(CommandHandler("status", status_command))
     application.add_handler(MessageHandler(filters.COMMAND, dynamic_command_router))
+    if config.telegram.webhook:
+        asyncio.run(_run_webhook(application))
+        return
+
     # Python 3.14 no longer creates a default event loop for the main thread.
     # python-telegram-bot 21.x still expects one to exist when run_polling starts.
     try:
         asyncio.get_event_loop()
     except RuntimeError:
         asyncio.set_event_loop(asyncio.new_event_loop())
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    application.run_polling(allowed_updates=ALLOWED_UPDATES)
@@ -0,0 +1,63 @@
+import hmac
+import json
+import logging
+from collections import OrderedDict
+from typing import Any
+from urllib.parse import urlsplit
+
+from telegram import Update
+from telegram.ext import Application
+
+from .app_config import TelegramWebhookConfig
+from .http_server import HttpRequest, HttpResponse, HttpServer
+
+
+LOG = logging.getLogger("telegram-webhook")
+SEEN_UPDATE_LIMIT = 1000
+
+
+class TelegramWebhook:
+    def __init__(self, config: TelegramWebhookConfig, application: Application, server: HttpServer):
+        self._config = config
+        self._application = application
+        self._seen_updates: OrderedDict[int, None] = OrderedDict()
+        server.add_route("POST", urlsplit(config.url).path or "/", self._handle)
+
+    async def register(self, allowed_updates: list[str]) -> None:
+        await self._application.bot.set_webhook(
+            url=self._config.url,
+            secret_token=self._config.secret,
+            max_connections=self._config.max_connections,
+            allowed_updates=allowed_updates,
+        )
+        LOG.info(
+            "Telegram webhook set to %s (max_connections=%s, allowed_updates=%s)",
+            self._config.url,
+            self._config.max_connections,
+            ",".join(allowed_updates),
+        )
+
+    async def _handle(self, request: HttpRequest) -> HttpResponse:
+        token = request.headers.get("x-telegram-bot-api-secret-token", "")
+        if not hmac.compare_digest(token.encode("utf-8"), self._config.secret.encode("utf-8")):
+            LOG.warning("Rejected Telegram webhook request with invalid secret token")
+            return HttpResponse(status=403)
+
+        try:
+            payload: Any = json.loads(request.body)
+            update = Update.de_json(payload, self._application.bot)
+        except (ValueError, TypeError, KeyError):
+            LOG.warning("Rejected malformed Telegram webhook update")
+            return HttpResponse(status=400)
+        if update is None:
+            return HttpResponse(status=400)
+
+        # Telegram redelivers an update when the previous response was slow or lost.
+        if update.update_id in self._seen_updates:
+            return HttpResponse(status=200)
+        self._seen_updates[update.update_id] = None
+        while len(self._seen_updates) > SEEN_UPDATE_LIMIT:
+            self._seen_updates.popitem(last=False)
+
+        await self._application.update_queue.put(update)
+        return HttpResponse(status=200)
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+from urllib.parse import urlsplit
+
+from .app_config import TwitchEventSubConfig
+from .http_server import HttpRequest, HttpResponse, HttpServer
+from .stream_clients import LiveResult, TwitchClient
+
+
+LOG = logging.getLogger("twitch-eventsub")
+EVENT_TYPES = ("stream.online", "stream.offline")
+ACTIVE_STATUSES = ("enabled", "webhook_callback_verification_pending")
+MAX_MESSAGE_AGE_SECONDS = 600
+SEEN_MESSAGE_LIMIT = 1000
+
+
+class TwitchEventSub:
+    def __init__(
+        self,
+        config: TwitchEventSubConfig,
+        client: TwitchClient,
+        server: HttpServer,
+        on_result: Callable[[str, LiveResult], Awaitable[None]],
+        on_reconcile: Callable[[list[str]], Awaitable[None]],
+    ):
+        self._config = config
+        self._client = client
+        self._on_result = on_result
+        self._on_reconcile = on_reconcile
+        self._seen_messages: OrderedDict[str, None] = OrderedDict()
+        self._resync = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+        server.add_route("POST", urlsplit(config.callback_url).path or "/", self._handle)
+
+    def resync(self) -> None:
+        self._resync.set()
+
+    async def run(self, channels: Callable[[], list[str]]) -> None:
+        reconnected = True
+        while True:
+            try:
+                created = await self._sync(channels())
+                if reconnected:
+                    await self._on_reconcile(channels())
+                    reconnected = False
+                elif created:
+                    await self._on_reconcile(created)
+            except Exception:
+                LOG.exception("Failed to sync Twitch EventSub subscriptions")
+                reconnected = True
+
+            self._resync.clear()
+            try:
+                await asyncio.wait_for(self._resync.wait(), timeout=self._config.sync_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sync(self, channels: list[str]) -> list[str]:
+        user_ids = await self._client.user_ids(channels)
+        logins_by_id = {user_id: login for login, user_id in user_ids.items()}
+        for channel in channels:
+            if channel.strip().lower() not in user_ids:
+                LOG.warning("Twitch channel %s not found, skipping EventSub", channel)
+
+        wanted = {(event_type, user_id) for user_id in logins_by_id for event_type in EVENT_TYPES}
+        active: set[tuple[str, str]] = set()
+        for subscription in await self._client.eventsub_subscriptions():
+            if subscription.get("transport", {}).get("callback") != self._config.callback_url:
+                continue
+            key = (subscription.get("type"), subscription.get("condition", {}).get("broadcaster_user_id"))
+            if key in wanted and key not in active and subscription.get("status") in ACTIVE_STATUSES:
+                active.add(key)
+                continue
+            await self._client.delete_eventsub_subscription(subscription["id"])
+
+        created: list[str] = []
+        for event_type, user_id in sorted(wanted - active):
+            await self._client.create_eventsub_subscription(
+                event_type, user_id, self._config.callback_url, self._config.secret
+            )
+            created.append(logins_by_id[user_id])
+
+        if created:
+            LOG.info("Created %s Twitch EventSub subscriptions", len(created))
+        return list(dict.fromkeys(created))
+
+    async def _handle(self, request: HttpRequest) -> HttpResponse:
+        message_id = request.headers.get("twitch-eventsub-message-id", "")
+        timestamp = request.headers.get("twitch-eventsub-message-timestamp", "")
+        signature = request.headers.get("twitch-eventsub-message-signature", "")
+        if not self._verify(message_id, timestamp, request.body, signature):
+            LOG.warning("Rejected Twitch EventSub message with invalid signature")
+            return HttpResponse(status=403)
+
+        if message_id in self._seen_messages:
+            return HttpResponse(status=204)
+        self._seen_messages[message_id] = None
+        while len(self._seen_messages) > SEEN_MESSAGE_LIMIT:
+            self._seen_messages.popitem(last=False)
+
+        payload = json.loads(request.body)
+        message_type = request.headers.get("twitch-eventsub-message-type")
+        if message_type == "webhook_callback_verification":
+            return HttpResponse(body=str(payload["challenge"]).encode("utf-8"))
+
+        if message_type == "revocation":
+            subscription = payload.get("subscription", {})
+            LOG.warning(
+                "Twitch EventSub subscription %s revoked: %s", subscription.get("type"), subscription.get("status")
+            )
+            self._resync.set()
+            return HttpResponse(status=204)
+
+        if message_type == "notification":
+            task = asyncio.create_task(self._handle_event(payload["subscription"]["type"], payload["event"]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return HttpResponse(status=204)
+
+    async def _handle_event(self, event_type: str, event: dict) -> None:
+        login = str(event.get("broadcaster_user_login", ""))
+        url = f"https://www.twitch.tv/{login}"
+        try:
+            if event_type == "stream.online":
+                try:
+                    result = await self._client.check_live(login)
+                except Exception:
+                    LOG.exception("Failed to fetch stream details for %s", login)
+                    result = LiveResult(False, url)
+                if not result.is_live:
+                    result = LiveResult(True, url, None, event.get("id"))
+            elif event_type == "stream.offline":
+                result = LiveResult(False, url)
+            else:
+                return
+            await self._on_result(login, result)
+        except Exception:
+            LOG.exception("Failed to handle Twitch EventSub %s for %s", event_type, login)
+
+    def _verify(self, message_id: str, timestamp: str, body: bytes, signature: str) -> bool:
+        if not message_id or not timestamp or not signature:
+            return False
+
+        try:
+            sent_at = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        except ValueError:
+            return False
+        if abs((datetime.now(timezone.utc) - sent_at).total_seconds()) > MAX_MESSAGE_AGE_SECONDS:
+            return False
+
+        expected = hmac.new(
+            self._config.secret.encode("utf-8"),
+            message_id.encode("utf-8") + timestamp.encode("utf-8") + body,
+            hashlib.sha256,
+        ).hexdigest()
+        return hmac.compare_digest(f"sha256={expected}", signature)
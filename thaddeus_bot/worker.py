@@ -0,0 +1,52 @@
+import asyncio
+import logging
+import math
+
+from .app_config import AppConfig, load_config
+from .config_reloader import ConfigReloader
+from .http_transport import HttpTransport
+from .sharding import SharedOutbox
+from .stream_monitor import StreamMonitor
+
+
+LOG = logging.getLogger("worker")
+
+
+def run_worker() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+    )
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+    config = load_config(max_age_seconds=math.inf)
+    if config.sharding is None:
+        raise RuntimeError("Worker mode requires sharding to be configured.")
+    try:
+        asyncio.run(_run_worker(config))
+    except KeyboardInterrupt:
+        LOG.info("Worker stopped")
+
+
+async def _run_worker(config: AppConfig) -> None:
+    transport = HttpTransport(config.http)
+    outbox = SharedOutbox(config.sharding.database)
+    monitor = StreamMonitor(config, send_queue=outbox, transport=transport)
+
+    async def apply_config(new_config: AppConfig) -> None:
+        if new_config.subscriptions != config.subscriptions:
+            monitor.update_subscriptions(new_config.subscriptions)
+
+    tasks = [
+        asyncio.create_task(monitor.run_forever()),
+        asyncio.create_task(ConfigReloader(config, transport, apply_config).run()),
+    ]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        monitor.close()
+        outbox.close()
+        await transport.aclose()
@@ -0,0 +1,143 @@
+import asyncio
+import hmac
+import logging
+import time
+import xml.etree.ElementTree as ElementTree
+from typing import Awaitable, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from .app_config import YouTubeWebSubConfig
+from .http_server import HttpRequest, HttpResponse, HttpServer
+from .http_transport import HttpTransport
+from .stream_clients import LiveResult, YouTubeClient
+
+
+LOG = logging.getLogger("youtube-websub")
+FEED_URL = "https://www.youtube.com/xml/feeds/videos.xml?channel_id={channel_id}"
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+YT_NS = "{http://www.youtube.com/xml/schemas/2015}"
+PENDING_VERIFICATION_SECONDS = 600
+
+
+class YouTubeWebSub:
+    def __init__(
+        self,
+        config: YouTubeWebSubConfig,
+        client: YouTubeClient,
+        transport: HttpTransport,
+        server: HttpServer,
+        on_result: Callable[[str, LiveResult], Awaitable[None]],
+    ):
+        self._config = config
+        self._client = client
+        self._transport = transport
+        self._on_result = on_result
+        self._wanted: set[str] = set()
+        self._lease_expires: dict[str, float] = {}
+        self._requested_at: dict[str, float] = {}
+        self._resync = asyncio.Event()
+        self._tasks: set[asyncio.Task] = set()
+        path = urlsplit(config.callback_url).path or "/"
+        server.add_route("GET", path, self._handle_verification)
+        server.add_route("POST", path, self._handle_notification)
+
+    def resync(self) -> None:
+        self._resync.set()
+
+    async def run(self, channels: Callable[[], list[str]]) -> None:
+        while True:
+            try:
+                await self._sync(set(channels()))
+            except Exception:
+                LOG.exception("Failed to sync YouTube WebSub subscriptions")
+
+            self._resync.clear()
+            try:
+                await asyncio.wait_for(self._resync.wait(), timeout=min(3600.0, self._config.lease_seconds / 10))
+            except asyncio.TimeoutError:
+                pass
+
+    async def _sync(self, channels: set[str]) -> None:
+        removed = self._wanted - channels
+        self._wanted = channels
+        for channel_id in removed:
+            self._lease_expires.pop(channel_id, None)
+            self._requested_at.pop(channel_id, None)
+            await self._request(channel_id, "unsubscribe")
+
+        now = time.time()
+        renew_before = now + self._config.lease_seconds / 5
+        for channel_id in sorted(channels):
+            expires = self._lease_expires.get(channel_id)
+            if expires is not None and expires > renew_before:
+                continue
+            requested = self._requested_at.get(channel_id)
+            if expires is None and requested is not None and now - requested < PENDING_VERIFICATION_SECONDS:
+                continue
+            try:
+                await self._request(channel_id, "subscribe")
+                self._requested_at[channel_id] = now
+            except Exception:
+                LOG.exception("Failed to subscribe to YouTube feed for %s", channel_id)
+
+    async def _request(self, channel_id: str, mode: str) -> None:
+        data = {
+            "hub.callback": self._config.callback_url,
+            "hub.topic": FEED_URL.format(channel_id=channel_id),
+            "hub.mode": mode,
+            "hub.verify": "async",
+        }
+        if mode == "subscribe":
+            data["hub.secret"] = self._config.secret
+            data["hub.lease_seconds"] = str(self._config.lease_seconds)
+
+        response = await self._transport.request("POST", self._config.hub_url, data=data)
+        response.raise_for_status()
+
+    async def _handle_verification(self, request: HttpRequest) -> HttpResponse:
+        mode = request.query.get("hub.mode", [""])[0]
+        topic = request.query.get("hub.topic", [""])[0]
+        challenge = request.query.get("hub.challenge", [""])[0]
+        channel_id = parse_qs(urlsplit(topic).query).get("channel_id", [""])[0]
+
+        if mode == "subscribe" and channel_id in self._wanted:
+            lease_seconds = int(request.query.get("hub.lease_seconds", [self._config.lease_seconds])[0])
+            self._lease_expires[channel_id] = time.time() + lease_seconds
+            LOG.info("YouTube WebSub lease for %s verified (%ss)", channel_id, lease_seconds)
+        elif not (mode == "unsubscribe" and channel_id and channel_id not in self._wanted):
+            return HttpResponse(status=404)
+
+        return HttpResponse(body=challenge.encode("utf-8"))
+
+    async def _handle_notification(self, request: HttpRequest) -> HttpResponse:
+        signature = request.headers.get("x-hub-signature", "")
+        algorithm, _, digest = signature.partition("=")
+        if algorithm not in ("sha1", "sha256"):
+            LOG.warning("Ignoring YouTube WebSub notification without a valid signature")
+            return HttpResponse(status=204)
+        expected = hmac.new(self._config.secret.encode("utf-8"), request.body, algorithm).hexdigest()
+        if not hmac.compare_digest(expected, digest):
+            LOG.warning("Ignoring YouTube WebSub notification with an invalid signature")
+            return HttpResponse(status=204)
+
+        try:
+            feed = ElementTree.fromstring(request.body)
+        except ElementTree.ParseError:
+            LOG.warning("Ignoring unparsable YouTube WebSub notification")
+            return HttpResponse(status=204)
+
+        for entry in feed.iter(f"{ATOM_NS}entry"):
+            video_id = entry.findtext(f"{YT_NS}videoId")
+            channel_id = entry.findtext(f"{YT_NS}channelId")
+            if video_id and channel_id in self._wanted:
+                task = asyncio.create_task(self._handle_video(channel_id, video_id))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        return HttpResponse(status=204)
+
+    async def _handle_video(self, channel_id: str, video_id: str) -> None:
+        try:
+            result = await self._client.check_video(channel_id, video_id)
+            await self._on_result(channel_id, result)
+        except Exception:
+            LOG.exception("Failed to check pushed YouTube video %s for %s", video_id, channel_id)